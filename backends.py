@@ -0,0 +1,294 @@
+# Dav2Mp4 media backends
+# GPLv3 license
+#
+# How the engine probes videos and does its stream copies:
+#   ffmpeg: an ffprobe process per probe, remux() and concat() return the
+#           ffmpeg command lines the engine runs
+#   pyav:   libav inside this process through PyAV (pip install av), probes,
+#           remuxes and concats run on the pool worker without starting any
+#           process. PyAV is only imported once this backend is created.
+# Re-encodes, burnt in timestamps, --extract trims and the piped merge are
+# always ffmpeg command lines (ffmpegCommand) whichever backend is chosen.
+
+import json
+import fractions
+import importlib.util
+import subprocess
+
+av=None # PyAV, loadAv() imports it for the pyav backend
+
+BACKENDS=('ffmpeg', 'pyav')
+CANCELLED=255 # exit code of a run stopped by Cancel, as ffmpeg's on a signal
+
+def loadAv():
+  # PyAV takes a while to import, only the pyav backend pays for it
+  global av
+  if (av is None):
+    import av.error # binds av, its errors live in a submodule
+  return av
+
+def available():
+  # the backend names that can be used here, without importing PyAV
+  return [name for name in BACKENDS if name!='pyav' or importlib.util.find_spec('av') is not None]
+
+def create( name, ffmpeg, ffprobe):
+  # ffmpeg, ffprobe: paths of the executables, for the ffmpeg backend
+  if (name=='ffmpeg'):
+    return SubprocessBackend( ffmpeg, ffprobe)
+  elif (name=='pyav'):
+    return PyAVBackend()
+  raise ValueError('unknown media backend '+str(name))
+
+def ffmpegCommand( ffmpeg, inputArgs, output, video, audio):
+  # ffmpeg -y -fflags +genpts <inputArgs> -map 0:v:0 -map 0:a? <video> -c:a <audio> output
+  # the first video stream and any audio, video: its codec options
+  return [ffmpeg, '-y', '-fflags', '+genpts']+inputArgs+\
+         ['-map', '0:v:0', '-map', '0:a?']+video+['-c:a', audio, output]
+
+def concatInput( listPath, inputs=None):
+  # input options reading the concat list at listPath, written from inputs if given
+  if (inputs is not None):
+    with open( listPath, 'w') as f:
+      for inPath in inputs:
+        f.write('file \''+inPath+'\'\n')
+  return ['-f', 'concat', '-safe', '0', '-i', listPath]
+
+def copyVideo( tag=None):
+  # stream copy options for the video, tag: MP4 video tag ('hvc1') or None
+  return ['-c:v', 'copy']+(['-tag:v', tag] if tag else [])
+
+class Cancel:
+  # stands in for an ffmpeg process in ConversionPool.cancel(),
+  # an in process run checks it between packets
+  def __init__(self):
+    self.killed=False
+
+  def kill(self):
+    self.killed=True
+
+class MediaBackend:
+  name=None
+
+  def probe(self, filePath):
+    # {'duration':secs, 'videoCodec':name, 'audioCodec':name}
+    # codecs are ffmpeg codec names ('h264', 'hevc', 'pcm_alaw'...) or None
+    # raises ValueError for a file it can't read
+    raise NotImplementedError
+
+  def remux(self, src, dst, audio='copy', tag=None):
+    # stream copy the first video stream of src, and its audio if any, into
+    # the MP4 dst. audio: 'copy' or 'aac' to encode audio MP4 can't hold,
+    # tag: MP4 video tag ('hvc1') or None. Returns what a FfmpegJob runs,
+    # an ffmpeg command list or an InProcess
+    raise NotImplementedError
+
+  def concat(self, inputs, dst, listPath, audio='copy', tag=None):
+    # remux() of inputs one after another, like ffmpeg's concat demuxer,
+    # listPath: where a concat list goes if one is needed
+    raise NotImplementedError
+
+class SubprocessBackend(MediaBackend):
+  name='ffmpeg'
+
+  def __init__(self, ffmpeg, ffprobe):
+    self.ffmpeg=ffmpeg
+    self.ffprobe=ffprobe
+
+  def probe(self, filePath):
+    command=[self.ffprobe,'-v', 'quiet', '-print_format', 'json',
+             '-show_entries', 'format=duration:stream=codec_type,codec_name', filePath]
+    pipe=subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    out, err = pipe.communicate()
+    info=json.loads(out.decode("utf-8"))
+    entry={'duration':float(info.get('format',{}).get('duration',0.0)),
+           'videoCodec':None, 'audioCodec':None}
+    for stream in info.get('streams',[]):
+      codecKey=stream.get('codec_type','')+'Codec'
+      if (entry.get(codecKey,'') is None):
+        entry[codecKey]=stream.get('codec_name')
+    return entry
+
+  def remux(self, src, dst, audio='copy', tag=None):
+    return ffmpegCommand( self.ffmpeg, ['-i', src], dst, copyVideo( tag), audio)
+
+  def concat(self, inputs, dst, listPath, audio='copy', tag=None):
+    return ffmpegCommand( self.ffmpeg, concatInput( listPath, inputs), dst, copyVideo( tag), audio)
+
+def copyStream( output, stream):
+  if (hasattr(output, 'add_stream_from_template')): # PyAV 14 on
+    return output.add_stream_from_template( stream)
+  return output.add_stream( template=stream)
+
+class PyAVBackend(MediaBackend):
+  name='pyav'
+
+  def __init__(self):
+    try:
+      loadAv()
+    except ImportError:
+      raise ValueError('the pyav backend needs PyAV, pip install av')
+
+  def probe(self, filePath):
+    try:
+      with av.open( filePath) as container:
+        video=container.streams.video
+        audio=container.streams.audio
+        duration=container.duration/1000000.0 if container.duration else 0.0
+        if (not duration and video and video[0].duration):
+          duration=float(video[0].duration*video[0].time_base)
+        return {'duration':duration,
+                'videoCodec':video[0].codec_context.name if video else None,
+                'audioCodec':audio[0].codec_context.name if audio else None}
+    except av.error.FFmpegError as e:
+      raise ValueError( str(e))
+
+  def remux(self, src, dst, audio='copy', tag=None):
+    return InProcess( [src], dst, audio, tag)
+
+  def concat(self, inputs, dst, listPath, audio='copy', tag=None):
+    return InProcess( list(inputs), dst, audio, tag)
+
+class InProcess:
+  # a remux or concat the pyav backend does on the pool worker
+  def __init__(self, inputs, output, audio, tag):
+    self.inputs=inputs
+    self.output=output
+    self.audio=audio
+    self.tag=tag
+
+  def __repr__(self):
+    # for the debug log, where the ffmpeg commands go
+    return ('pyav '+('remux' if len(self.inputs)==1 else 'concat')+' '+' '.join(self.inputs)+
+            ' -> '+self.output+' (audio '+self.audio+(', tag '+self.tag if self.tag else '')+')')
+
+  def run(self, progress, cancel):
+    # calls progress( seconds of output) as it goes and stops once
+    # cancel.killed, returns an ffmpeg style exit code
+    # raises ValueError if libav can't read or write the files
+    try:
+      with av.open( self.output, 'w', format='mp4') as output:
+        Remux( output, self.audio, self.tag, progress, cancel).run( self.inputs)
+    except av.error.FFmpegError as e:
+      raise ValueError( str(e))
+    return CANCELLED if cancel.killed else 0
+
+class Remux:
+  # copies the first video (and audio) stream of each input into output,
+  # one after another like the concat demuxer. Timestamps move on by what
+  # came before, audio that MP4 can't hold is encoded to AAC.
+  def __init__(self, output, audio, tag, progress, cancel):
+    self.output=output
+    self.audio=audio
+    self.tag=tag
+    self.progress=progress
+    self.cancel=cancel
+    self.videoOut=None
+    self.audioOut=None
+    self.lastDts={} # output stream -> dts of its last packet
+    self.end=0.0 # seconds of output so far
+    self.reported=0.0 # self.end at the last progress() call
+    self.fifo=None # AAC encoding: resampled audio waiting for a whole frame
+    self.resampler=None
+    self.samples=0 # AAC samples encoded or waiting in the fifo
+
+  def run(self, inputs):
+    for inPath in inputs:
+      if (self.cancel.killed):
+        return
+      with av.open( inPath, options={'fflags':'+genpts'}) as container:
+        self.copyInput( container)
+    if (self.fifo is not None):
+      self.encodeAudio( flush=True)
+
+  def copyInput(self, container):
+    if (not container.streams.video):
+      raise ValueError('no video stream in '+container.name)
+    video=container.streams.video[0]
+    audio=container.streams.audio[0] if container.streams.audio else None
+    if (self.videoOut is None):
+      self.addStreams( video, audio)
+    streams=[video]+([audio] if (audio and self.audioOut) else [])
+    offset=self.end
+    shifts={} # input stream -> ticks added to its timestamps
+    if (self.fifo is not None):
+      self.padAudio( offset)
+    for packet in container.demux( *streams):
+      if (self.cancel.killed):
+        return
+      if (packet.dts is None and packet.pts is None):
+        continue # the demuxer's end of stream packet
+      if (packet.stream is audio and self.fifo is not None):
+        for frame in packet.decode():
+          self.queueAudio( frame)
+        self.encodeAudio()
+        continue
+      outStream=self.videoOut if packet.stream is video else self.audioOut
+      if (packet.pts is None):
+        packet.pts=packet.dts
+      if (packet.dts is None):
+        packet.dts=packet.pts
+      if (packet.stream not in shifts):
+        # move on by the output so far, and past the last dts so the muxer
+        # never sees time go backwards at the join
+        shift=int(round(offset/packet.time_base))
+        if (outStream in self.lastDts):
+          shift=max(shift, self.lastDts[outStream]+1-packet.dts)
+        shifts[packet.stream]=shift
+      packet.pts+=shifts[packet.stream]
+      packet.dts+=shifts[packet.stream]
+      self.lastDts[outStream]=packet.dts
+      if (outStream is self.videoOut):
+        self.end=max(self.end, float((packet.pts+(packet.duration or 0))*packet.time_base))
+        if (self.end-self.reported>=1.0):
+          self.progress( self.end)
+          self.reported=self.end
+      packet.stream=outStream
+      self.output.mux( packet)
+
+  def addStreams(self, video, audio):
+    # the output's streams come from the first input, like the concat demuxer
+    self.videoOut=copyStream( self.output, video)
+    if (self.tag):
+      self.videoOut.codec_context.codec_tag=self.tag
+    if (audio and self.audio=='copy'):
+      self.audioOut=copyStream( self.output, audio)
+    elif (audio):
+      rate=audio.codec_context.sample_rate
+      # DAV audio is mono, and its layout often only a channel count AAC won't take
+      layout='mono' if len(audio.codec_context.layout.channels)==1 else 'stereo'
+      self.audioOut=self.output.add_stream( 'aac', rate=rate)
+      self.audioOut.codec_context.layout=layout
+      self.resampler=av.AudioResampler( format='fltp', layout=layout, rate=rate)
+      self.fifo=av.AudioFifo()
+
+  def queueAudio(self, frame):
+    frames=self.resampler.resample( frame)
+    for frame in (frames if isinstance(frames, list) else [frames]): # a list from PyAV 9 on
+      frame.pts=None # the fifo doesn't keep the input's timing, samples does
+      self.samples+=frame.samples
+      self.fifo.write( frame)
+
+  def padAudio(self, seconds):
+    # silence up to seconds, where the next input starts, if its audio was short
+    codec=self.audioOut.codec_context
+    missing=int(round(seconds*codec.sample_rate))-self.samples
+    if (missing>0):
+      frame=av.AudioFrame( format='fltp', layout=codec.layout, samples=missing)
+      for plane in frame.planes:
+        plane.update( bytes(plane.buffer_size))
+      frame.sample_rate=codec.sample_rate
+      self.samples+=missing
+      self.fifo.write( frame)
+
+  def encodeAudio(self, flush=False):
+    codec=self.audioOut.codec_context
+    frameSize=codec.frame_size or 1024
+    while self.fifo.samples>=frameSize or (flush and self.fifo.samples):
+      frame=self.fifo.read( min(frameSize, self.fifo.samples))
+      frame.pts=self.samples-self.fifo.samples-frame.samples
+      frame.time_base=fractions.Fraction(1, codec.sample_rate)
+      for packet in self.audioOut.encode( frame):
+        self.output.mux( packet)
+    if (flush):
+      for packet in self.audioOut.encode( None):
+        self.output.mux( packet)
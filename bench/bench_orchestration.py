@@ -0,0 +1,234 @@
+# Dav2Mp4 orchestration benchmark
+# GPLv3 license
+#
+# Times everything Dav2Mp4 does around ffmpeg: folder scans, filename
+# parsing, DHAV probing, the journal, merge planning, subtitles, logging and
+# process spawning. A synthetic DAV folder with realistically named clips
+# (several channels, _1 duplicates, gaps, multi-GB totals kept as sparse
+# files) goes through the whole runConversions path in each mode, with
+# stand-in ffmpeg/ffprobe executables that do no media work: they only
+# count themselves and write a sparse output the size of their inputs.
+# Reports wall time, spawned processes and peak Python memory per stage.
+#   python bench/bench_orchestration.py [--channels 4] [--hours 4] [--clip-seconds 60]
+#                                       [--clip-mb 8] [--workers N] [--keep]
+#   python bench/bench_orchestration.py --real   tiny testsrc clips through the real ffmpeg
+#   python bench/bench_orchestration.py --real --backend pyav   the same stages probed and copied in process
+# The stand-ins are Python scripts with a #! line, so this runs on Linux/macOS.
+# Peak memory uses tracemalloc which slows allocation, --no-memory to time without it.
+
+import os, sys
+import argparse
+import datetime
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import engine
+import backends
+
+START=datetime.datetime(2017, 6, 1, 22, 0, 0)
+
+# stand-in ffmpeg: -i inputs are files, concat lists or 'STUB <bytes>' lines
+# on stdin (the piped merge), the output is a sparse file of their total size
+STUB_FFMPEG='''#!%(python)s
+import os, sys
+with open(%(counter)r, 'a') as f:
+  f.write('ffmpeg\\n')
+args=sys.argv[1:]
+size=0
+for n, arg in enumerate(args[:-1]):
+  if (arg!='-i'):
+    continue
+  source=args[n+1]
+  if (source=='pipe:0'):
+    size+=sum(int(line.split()[1]) for line in sys.stdin.buffer if line.startswith(b'STUB '))
+  elif (source.endswith('.txt')):
+    with open( source) as f:
+      size+=sum(os.path.getsize( line[6:-2]) for line in f if line.startswith('file '))
+  else:
+    size+=os.path.getsize( source)
+if (args[-1]=='pipe:1'):
+  sys.stdout.buffer.write(b'STUB %%d\\n' %% size)
+else:
+  with open( args[-1], 'wb') as f:
+    f.truncate( size)
+  print('out_time_us=1000000')
+  print('progress=end')
+'''
+
+# stand-in ffprobe: every video lasts the clip length and is h264
+STUB_FFPROBE='''#!%(python)s
+with open(%(counter)r, 'a') as f:
+  f.write('ffprobe\\n')
+print('{"format":{"duration":"%(duration).3f"},"streams":[{"codec_type":"video","codec_name":"h264"}]}')
+'''
+
+# counting wrapper around the real executable, for --real
+STUB_REAL='''#!%(python)s
+import os, sys
+with open(%(counter)r, 'a') as f:
+  f.write(%(name)r+'\\n')
+os.execv(%(real)r, [%(real)r]+sys.argv[1:])
+'''
+
+def writeStub( folder, name, template, **values):
+  stubPath=os.path.join( folder, name)
+  with open( stubPath, 'w') as f:
+    f.write( template % dict(values, python=sys.executable))
+  os.chmod( stubPath, 0o755)
+  return stubPath
+
+def dhavFrames( startDatetime, seconds):
+  # one h264 key frame per second (frame rate 1) with the camera's clock,
+  # enough for dhav.py to read the codec and real duration
+  frames=[]
+  for n in range(seconds):
+    when=startDatetime+datetime.timedelta(seconds=n)
+    date=(when.year-2000)<<26 | when.month<<22 | when.day<<17 | when.hour<<12 | when.minute<<6 | when.second
+    extension=struct.pack('<BBBB', 0x81, 0, 2, 1)
+    length=24+len(extension)+16+8
+    frames.append( struct.pack('<4sBBBBIIIHBB', b'DHAV', 0xFD, 0, 0, 0, n, length, date, n*1000 & 0xFFFF, len(extension), 0)+
+                   extension+b'\0'*16+struct.pack('<4sI', b'dhav', length))
+  return b''.join(frames)
+
+def clipNames( channels, hours, clipSeconds, duplicateEvery, gapEvery):
+  # (name, start Datetime, recorded seconds) of every clip, NVR style:
+  # NPV-CH01-MAIN-<start>-<end>.dav, end is the last recorded second
+  clips=[]
+  count=int(hours*3600//clipSeconds)
+  for channel in range(1, channels+1):
+    prefix='NPV-CH%02d-MAIN-' % channel
+    for n in range(count):
+      if (gapEvery and n%gapEvery==gapEvery-1):
+        continue # the camera was off
+      start=START+datetime.timedelta(seconds=n*clipSeconds)
+      end=start+datetime.timedelta(seconds=clipSeconds-1)
+      name=prefix+start.strftime('%Y%m%d%H%M%S')+'-'+end.strftime('%Y%m%d%H%M%S')
+      clips.append( (name+'.dav', start, clipSeconds))
+      if (duplicateEvery and n%duplicateEvery==duplicateEvery-1):
+        clips.append( (name+'_1.dav', start, clipSeconds//2)) # the _1 anomaly, a shorter recording
+  return clips
+
+def makeStubFolder( folder, clips, clipBytes):
+  # DHAV headers followed by a sparse tail up to the clip's size
+  os.makedirs( folder)
+  total=0
+  longest=max(clip[2] for clip in clips)
+  for name, start, seconds in clips:
+    size=clipBytes*seconds//longest
+    with open( os.path.join( folder, name), 'wb') as f:
+      f.write( dhavFrames( start, seconds))
+      f.truncate( max(size, f.tell()))
+    total+=os.path.getsize( os.path.join( folder, name))
+  return total
+
+def makeRealFolder( folder, clips, ffmpeg):
+  # tiny testsrc clips, MPEG-TS named .dav so they go through ffprobe
+  os.makedirs( folder)
+  total=0
+  for name, start, seconds in clips:
+    clipPath=os.path.join( folder, name)
+    subprocess.check_call([ffmpeg, '-v', 'error', '-y', '-f', 'lavfi',
+                           '-i', 'testsrc=size=160x120:rate=10:duration='+str(seconds),
+                           '-c:v', 'libx264', '-preset', 'ultrafast', '-f', 'mpegts', clipPath])
+    total+=os.path.getsize( clipPath)
+  return total
+
+def counted( counter):
+  # (ffmpeg, ffprobe) processes started so far
+  try:
+    with open( counter) as f:
+      names=f.read().split()
+  except OSError:
+    return 0, 0
+  return names.count('ffmpeg'), names.count('ffprobe')
+
+def runStage( name, folders, options, counter, memory):
+  davFolder, mp4Folder, mergedFolder = folders
+  for folder in (mp4Folder, mergedFolder):
+    os.makedirs( folder, exist_ok=True)
+  engine._probeCache=engine.ProbeCache() # each stage probes from scratch
+  ffmpegBefore, ffprobeBefore = counted( counter)
+  if (memory):
+    tracemalloc.start()
+  start=time.perf_counter()
+  summary=engine.runConversions( davFolder, mp4Folder, mergedFolder, options)
+  seconds=time.perf_counter()-start
+  peak=0
+  if (memory):
+    peak=tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+  ffmpegAfter, ffprobeAfter = counted( counter)
+  print('%-9s %8.2fs %7d %8d %8.1f %6d %6d %5d %5d' % (
+    name, seconds, ffmpegAfter-ffmpegBefore, ffprobeAfter-ffprobeBefore, peak/1000000.0,
+    len(summary['converted']), len(summary['merged']), len(summary['skipped']), len(summary['failed'])))
+  return summary
+
+def main():
+  parser=argparse.ArgumentParser( description='benchmark Dav2Mp4 around ffmpeg')
+  parser.add_argument('--channels', type=int, default=4)
+  parser.add_argument('--hours', type=float, default=4)
+  parser.add_argument('--clip-seconds', type=int, default=60, help='recorded length of each clip')
+  parser.add_argument('--clip-mb', type=float, default=8, help='size of a full clip (sparse)')
+  parser.add_argument('--duplicates', type=int, default=25, help='a _1 twin every N clips, 0 for none')
+  parser.add_argument('--gaps', type=int, default=40, help='a missing clip every N clips, 0 for none')
+  parser.add_argument('--workers', type=int, default=engine.DEFAULT_WORKERS)
+  parser.add_argument('--real', action='store_true', help='tiny clips through the real ffmpeg/ffprobe')
+  parser.add_argument('--backend', choices=backends.BACKENDS, default='ffmpeg',
+                      help='media backend for every stage, pyav needs --real')
+  parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, for the fastest wall times')
+  parser.add_argument('--keep', action='store_true', help='keep the temporary folders')
+  args=parser.parse_args()
+  if (args.backend not in backends.available()):
+    parser.error('--backend '+args.backend+' needs PyAV, pip install av')
+  if (args.backend=='pyav' and not args.real):
+    parser.error('--backend pyav needs --real, the stand-in clips are not real video')
+  work=tempfile.mkdtemp( prefix='dav2mp4-bench-')
+  counter=os.path.join( work, 'processes.txt')
+  try:
+    if (args.real):
+      realFfmpeg, realFfprobe = shutil.which('ffmpeg'), shutil.which('ffprobe')
+      if not (realFfmpeg and realFfprobe):
+        parser.error('--real needs ffmpeg and ffprobe on the PATH')
+      if ('--clip-seconds' not in sys.argv):
+        args.clip_seconds=3
+      if ('--hours' not in sys.argv):
+        args.hours=args.clip_seconds*20/3600.0
+      clips=clipNames( min(args.channels, 2), args.hours, args.clip_seconds, args.duplicates, args.gaps)
+      total=makeRealFolder( os.path.join( work, 'dav'), clips, realFfmpeg)
+      engine.FFMPEG=writeStub( work, 'ffmpeg', STUB_REAL, counter=counter, name='ffmpeg', real=realFfmpeg)
+      engine.FFPROBE=writeStub( work, 'ffprobe', STUB_REAL, counter=counter, name='ffprobe', real=realFfprobe)
+    else:
+      clips=clipNames( args.channels, args.hours, args.clip_seconds, args.duplicates, args.gaps)
+      total=makeStubFolder( os.path.join( work, 'dav'), clips, int(args.clip_mb*1000000))
+      engine.FFMPEG=writeStub( work, 'ffmpeg', STUB_FFMPEG, counter=counter)
+      engine.FFPROBE=writeStub( work, 'ffprobe', STUB_FFPROBE, counter=counter, duration=args.clip_seconds-0.03)
+    davFolder=os.path.join( work, 'dav')
+    stage=lambda name: (davFolder, os.path.join( work, name, 'mp4'), os.path.join( work, name, 'merged'))
+    print('%d clips in %d channels, %.1f GB, %d workers, %s backend%s' % (
+      len(clips), args.channels, total/1e9, args.workers, args.backend, ' (real ffmpeg)' if args.real else ''))
+    print('%-9s %9s %7s %8s %8s %6s %6s %5s %5s' % (
+      'stage', 'wall', 'ffmpeg', 'ffprobe', 'peak MB', 'conv', 'merged', 'skip', 'fail'))
+    memory=not args.no_memory
+    options=lambda **settings: engine.Options( workers=args.workers, backend=args.backend, **settings)
+    runStage( 'pipeline', stage('pipeline'), options(), counter, memory)
+    runStage( 'resume', stage('pipeline'), options(), counter, memory) # all journaled already
+    runStage( 'convert', stage('passes'), options( merge=False), counter, memory)
+    runStage( 'merge', stage('passes'), options( convert=False), counter, memory)
+    runStage( 'direct', stage('direct'), options( direct=True), counter, memory)
+    runStage( 'pipe', stage('pipe'), options( direct=True, pipe=True), counter, memory)
+    window=(START+datetime.timedelta(seconds=args.clip_seconds//2),
+            START+datetime.timedelta(seconds=int(args.hours*3600*0.25)))
+    runStage( 'extract', stage('extract'), options( extract=('CH01',)+window), counter, memory)
+  finally:
+    if (args.keep):
+      print('kept '+work)
+    else:
+      shutil.rmtree( work, ignore_errors=True)
+
+if __name__=='__main__':
+  main()
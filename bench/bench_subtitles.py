@@ -0,0 +1,96 @@
+# Dav2Mp4 subtitle benchmark
+# GPLv3 license
+#
+# Times the old per-cue SRT loop against subtitles.py on a day of clips
+# from one camera, and checks both give the same cues.
+#   python bench/bench_subtitles.py [--hours 24] [--clip 59.97] [--repeat 3]
+
+import os, sys
+import argparse
+import datetime
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import subtitles
+
+def legacyWriteSubtitles( subtitlePath, clips):
+  # the V1.4 writeSubtitles loop, durations passed in instead of probed
+  srtID=1
+  srtTime=0.0
+  with open( subtitlePath, 'w') as f2:
+    for namedStartTimeObj, videoDuration in clips:
+      for fileTime in range(0, int(videoDuration+1.0)):
+        if ((fileTime+0.999)<=videoDuration):
+          srtStart=srtTime+fileTime
+          srtEnd=srtTime+fileTime+0.999
+        else:
+          srtStart=srtTime+fileTime
+          srtEnd=srtTime+videoDuration
+        srtStartHours, srtStartRem=(srtStart//3600, srtStart%3600)
+        srtStartMins, srtStartSecs=(srtStartRem//60, srtStartRem%60)
+        srtStartMillis=srtStart%1
+        srtEndHours, srtEndRem=(srtEnd//3600, srtEnd%3600)
+        srtEndMins, srtEndSecs=(srtEndRem//60, srtEndRem%60)
+        srtEndMillis=srtEnd%1
+        srtTimeDisplay='{:02d}:{:02d}:{:02d},{:03d} --> {:02d}:{:02d}:{:02d},{:03d}'.format(
+          int(srtStartHours), int(srtStartMins), int(srtStartSecs), int(srtStartMillis*1000),
+          int(srtEndHours), int(srtEndMins), int(srtEndSecs), int(srtEndMillis*1000))
+        displayDateTimeObj = namedStartTimeObj + datetime.timedelta(seconds=fileTime)
+        displayDateTimeStr = displayDateTimeObj.strftime('%Y-%m-%d %H:%M:%S')
+        f2.write(str(srtID)+'\n'+srtTimeDisplay+'\n'+displayDateTimeStr+'\n\n')
+        srtID+=1
+      srtTime+=videoDuration+0.001
+
+def dayOfClips( hours, clipSeconds):
+  # contiguous clips named a minute apart that really last clipSeconds
+  start=datetime.datetime(2017, 6, 1, 23, 30, 0)
+  return [(start+datetime.timedelta(minutes=n), clipSeconds) for n in range(int(hours*60))]
+
+def cueTexts( subtitlePath):
+  # display texts only: the old loop's float times can be 1ms off
+  # the old loop also ends a whole second clip with a zero length cue
+  # (start==end), which the new writer leaves out, so those are skipped
+  texts=[]
+  with open( subtitlePath) as f:
+    for cue in f.read().split('\n\n'):
+      if (cue):
+        id, times, text = cue.split('\n')[:3]
+        start, end = times.split(' --> ')
+        if (start!=end):
+          texts.append( text)
+  return texts
+
+def timed( function, repeat):
+  best=None
+  for n in range(repeat):
+    start=time.perf_counter()
+    function()
+    elapsed=time.perf_counter()-start
+    best=elapsed if best is None else min(best, elapsed)
+  return best
+
+def main():
+  parser=argparse.ArgumentParser( description='benchmark the subtitle writers')
+  parser.add_argument('--hours', type=float, default=24)
+  parser.add_argument('--clip', type=float, default=59.97, help='real clip duration in seconds')
+  parser.add_argument('--repeat', type=int, default=3)
+  args=parser.parse_args()
+  clips=dayOfClips( args.hours, args.clip)
+  folder=tempfile.mkdtemp()
+  legacyPath=os.path.join( folder, 'legacy.srt')
+  print('%d clips, %.1f hours of cues' % (len(clips), args.hours))
+  legacy=timed( lambda: legacyWriteSubtitles( legacyPath, clips), args.repeat)
+  print('%-8s %8.3fs' % ('legacy', legacy))
+  for fmt in subtitles.FORMATS:
+    newPath=os.path.join( folder, 'new.'+fmt)
+    seconds=timed( lambda: subtitles.writeSubtitles( newPath, clips, fmt), args.repeat)
+    print('%-8s %8.3fs  %5.1fx' % (fmt, seconds, legacy/seconds))
+  if (cueTexts( legacyPath)!=cueTexts( os.path.join( folder, 'new.srt'))):
+    print('WARNING: srt cues differ from the legacy loop')
+  for file in os.listdir( folder):
+    os.remove( os.path.join( folder, file))
+  os.rmdir( folder)
+
+if __name__=='__main__':
+  main()
@@ -0,0 +1,157 @@
+# Dav2Mp4 clip catalog
+# GPLv3 license
+#
+# Filenames are parsed once into Clip records, grouped by channel (the
+# filename prefix before the times, eg NPV-CH01-MAIN-) and kept sorted by
+# time in each channel. A channel splits into runs of contiguous clips, each
+# a list of slots holding the clips of one time range (the _1 variants), and
+# keeps parallel lists of start seconds and the running maximum end so the
+# clips overlapping [t0, t1] are a bisect instead of a filename comparison.
+# filename = <CAM><StartyyyymmddhhMMss>[-_ ]<EndyyyymmddhhMMss>{_1}.ext
+# times are whole seconds, end is the last recorded second (inclusive)
+
+import os, re
+import bisect
+import itertools
+import datetime
+import functools
+import collections
+
+NAME_PATTERN=re.compile(r'(.*)(\d{14})[-_ ](\d{14})')
+MAIN_TRACK='MAIN' # the full resolution stream, NVRs also record an ALT/SUB one
+
+def prefixFields( prefix):
+  # 'NPV-CH01-MAIN-' -> ['NPV', 'CH01', 'MAIN']
+  return [field for field in re.split( r'[-_ ]+', prefix.upper()) if field]
+
+def seconds( when):
+  # datetime -> whole seconds on the catalog's time line
+  return when.toordinal()*86400+when.hour*3600+when.minute*60+when.second
+
+def _parseTime( text):
+  when=datetime.datetime( int(text[0:4]), int(text[4:6]), int(text[6:8]),
+                          int(text[8:10]), int(text[10:12]), int(text[12:14]))
+  return when, seconds( when)
+
+class Clip:
+  __slots__=('name', 'prefix', 'startTime', 'endTime', 'startDatetime', 'endDatetime', 'start', 'end')
+
+  def __init__(self, name, prefix, startTime, endTime):
+    self.name=name
+    self.prefix=prefix
+    self.startTime=startTime # yyyymmddhhMMss as in the filename
+    self.endTime=endTime
+    self.startDatetime, self.start = _parseTime( startTime)
+    self.endDatetime, self.end = _parseTime( endTime)
+
+  @property
+  def namedDuration(self):
+    return float(self.end-self.start+1)
+
+  def __repr__(self):
+    return 'Clip('+repr(self.name)+')'
+
+@functools.lru_cache(maxsize=65536)
+def parseClip( name):
+  # Clip for a filename, None if it doesn't follow the NVR naming convention
+  match=NAME_PATTERN.match( name)
+  if (not match):
+    return None
+  try:
+    return Clip( name, *match.groups())
+  except ValueError: # 14 digits that aren't a date
+    return None
+
+def areContiguous( clip, prevClip):
+  # true if clip starts where prevClip ends
+  # -- I've observed video files w duration of just 1 second
+  #    so allow 2 second margin of error unless the clip
+  #    itself is less than 3 seconds then they have to be exact
+  timeDifference=abs(prevClip.end-clip.start)
+  if (clip.end-clip.start+1<3):
+    return (timeDifference==0)
+  return (timeDifference<=2)
+
+def sameTimeRange( clip1, clip2):
+  return (clip1.start==clip2.start and clip1.end==clip2.end)
+
+class Channel:
+  # the clips of one camera/track, sorted by start, end, name
+  def __init__(self, prefix, clips):
+    self.prefix=prefix
+    self.clips=sorted( clips, key=lambda clip: (clip.start, clip.end, clip.name))
+    self.starts=[clip.start for clip in self.clips]
+    self.ends=[clip.end for clip in self.clips]
+    self.maxEnds=list(itertools.accumulate( self.ends, max))
+
+  def __len__(self):
+    return len(self.clips)
+
+  def __iter__(self):
+    return iter(self.clips)
+
+  def overlapping(self, t0, t1):
+    # clips with any recorded second in [t0, t1] (datetimes or seconds)
+    if (isinstance(t0, datetime.datetime)):
+      t0=seconds( t0)
+    if (isinstance(t1, datetime.datetime)):
+      t1=seconds( t1)
+    # maxEnds only grows: before lo every clip ended before t0,
+    # from hi on every clip starts after t1
+    lo=bisect.bisect_left( self.maxEnds, t0)
+    hi=bisect.bisect_right( self.starts, t1)
+    return [clip for clip in self.clips[lo:hi] if clip.end>=t0]
+
+  def runs(self):
+    # split into runs of contiguous clips, each run a list of slots and
+    # each slot the clips with the same recorded time range
+    runs=[]
+    prevClip=None
+    for clip in self.clips:
+      if (prevClip and sameTimeRange( clip, prevClip)):
+        runs[-1][-1].append( clip)
+      elif (prevClip and areContiguous( clip, prevClip)):
+        runs[-1].append([clip])
+      else:
+        runs.append([[clip]])
+      prevClip=clip
+    return runs
+
+class Catalog:
+  # one folder scan: channels by prefix, plus the names that don't parse
+  def __init__(self, names):
+    byPrefix=collections.defaultdict(list)
+    self.unparsed=[]
+    for name in names:
+      clip=parseClip( name)
+      if (clip):
+        byPrefix[clip.prefix].append( clip)
+      else:
+        self.unparsed.append( name)
+    self.channels=collections.OrderedDict( (prefix, Channel( prefix, byPrefix[prefix])) for prefix in sorted(byPrefix))
+
+  @classmethod
+  def scan(cls, folder, extensions):
+    return cls( sorted(name for name in os.listdir( folder) if name.endswith( extensions)))
+
+  def __iter__(self):
+    return iter(self.channels.values())
+
+  def overlapping(self, prefix, t0, t1):
+    channel=self.channels.get( prefix)
+    return channel.overlapping( t0, t1) if channel else []
+
+  def named(self, name):
+    # the channels a camera name like CH01, CH01-ALT or NPV-CH01-MAIN-
+    # stands for: its fields appear whole and in order in their prefix, any
+    # case (CH01 isn't CH011). A name that leaves out the track means MAIN.
+    fields=prefixFields( name)
+    found=[]
+    for channel in self:
+      prefix=prefixFields( channel.prefix)
+      if (fields and any(prefix[n:n+len(fields)]==fields for n in range(len(prefix)-len(fields)+1))):
+        found.append( channel)
+    main=[channel for channel in found if MAIN_TRACK in prefixFields( channel.prefix)]
+    if (len(found)>1 and main and len(main)<len(found)):
+      return main
+    return found
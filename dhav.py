@@ -0,0 +1,139 @@
+# Dav2Mp4 DHAV reader
+# GPLv3 license
+#
+# Reads the frame headers of a Dahua DAV (DHAV) file without decoding
+# anything, to get the real frame count, per frame timestamps, codecs and
+# exact duration with no ffprobe process. ffmpeg guesses DHAV frame rates
+# and can be 5-20% off, the camera's own timestamps are not.
+#
+# DHAV frame (little endian), see also ffmpeg libavformat/dhav.c:
+#   'DHAV'
+#   type u8: 0xFD key frame, 0xFC/0xFB other video, 0xF0 audio, 0xF1 aux data
+#   subtype u8, channel u8, subnumber u8
+#   frame number u32, frame length u32 (the whole frame, header to trailer)
+#   date u32: sec&0x3F, min>>6&0x3F, hour>>12&0x1F, day>>17&0x1F,
+#             month>>22&0xF, 2000+year>>26&0x3F
+#   timestamp u16: milliseconds, wraps every 65.536s
+#   extension length u8, checksum u8
+#   extensions: tagged fields, 0x81 = video codec + frame rate,
+#               0x83/0x8C = audio channels, codec, sample rate
+#   payload
+#   trailer: 'dhav' + frame length u32
+
+import mmap
+import struct
+import array
+import datetime
+
+_HEADER=struct.Struct('<4sBBBBIIIHBB')
+_TRAILER=struct.Struct('<4sI')
+KEY_FRAME=0xFD
+VIDEO_FRAMES=(0xFD, 0xFC, 0xFB)
+AUDIO_FRAME=0xF0
+
+# codec numbers -> ffmpeg codec names
+VIDEO_CODECS={1:'mpeg4', 2:'h264', 3:'mjpeg', 4:'h264', 8:'h264', 0xC:'hevc'}
+AUDIO_CODECS={0x07:'pcm_s8', 0x0A:'pcm_mulaw', 0x0C:'pcm_s16le', 0x0D:'adpcm_ms', 0x0E:'pcm_alaw',
+              0x10:'pcm_s16le', 0x16:'pcm_mulaw', 0x1A:'aac', 0x1F:'mp2', 0x21:'mp3'}
+SAMPLE_RATES=[8000, 4000, 8000, 11025, 16000, 20000, 22050, 32000, 44100, 48000, 96000, 192000, 64000]
+
+# extension tag -> its length in bytes, for the ones that are just skipped
+_EXTENSION_LENGTHS={0x80:4, 0x81:4, 0x82:8, 0x83:4, 0x88:8, 0x8C:8,
+                    0x84:4, 0x85:4, 0x8B:4, 0x94:4, 0x96:4, 0xA0:4, 0xB2:4, 0xB4:4,
+                    0x91:8, 0x92:8, 0x93:8, 0x95:8, 0x9A:8, 0x9B:8, 0xB3:8}
+
+class DhavInfo:
+  __slots__=('frames', 'keyFrames', 'timestamps', 'keyTimestamps', 'videoCodec', 'audioCodec',
+             'frameRate', 'sampleRate', 'startDatetime', 'endDatetime', 'duration')
+
+  def __init__(self):
+    self.frames=0 # video frames
+    self.keyFrames=0
+    self.timestamps=array.array('q') # ms of each video frame from the first one
+    self.keyTimestamps=array.array('q') # ms of the key frames, where a cut can start
+    self.videoCodec=None # ffmpeg codec names, None if unknown
+    self.audioCodec=None
+    self.frameRate=None # as stored in the file
+    self.sampleRate=None
+    self.startDatetime=None # camera clock at the first and last video frame
+    self.endDatetime=None
+    self.duration=0.0 # seconds
+
+def frameDatetime( date):
+  try:
+    return datetime.datetime( 2000+(date>>26 & 0x3F), date>>22 & 0xF, date>>17 & 0x1F,
+                              date>>12 & 0x1F, date>>6 & 0x3F, date & 0x3F)
+  except ValueError:
+    return None
+
+def _readExtensions( data, pos, length, info):
+  end=pos+length
+  while pos<end:
+    tag=data[pos]
+    if (tag==0x81 and pos+4<=end):
+      info.videoCodec=VIDEO_CODECS.get( data[pos+2], info.videoCodec)
+      info.frameRate=data[pos+3] or info.frameRate
+    elif (tag in (0x83, 0x8C) and pos+4<=end):
+      at=pos+1 if tag==0x83 else pos+2 # 0x8C has a pad byte first
+      info.audioCodec=AUDIO_CODECS.get( data[at+1], info.audioCodec)
+      index=data[at+2]
+      info.sampleRate=SAMPLE_RATES[index] if index<len(SAMPLE_RATES) else 8000
+    if (tag not in _EXTENSION_LENGTHS):
+      break # unknown, skip the rest like ffmpeg
+    pos+=_EXTENSION_LENGTHS[tag]
+
+def readFile( filePath):
+  # DhavInfo for a DAV file, None if it has no DHAV video frames
+  with open( filePath, 'rb') as f:
+    try:
+      data=mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError: # empty file
+      return None
+    try:
+      return _read( data)
+    finally:
+      data.close()
+
+def _read( data):
+  info=DhavInfo()
+  size=len(data)
+  pos=data.find(b'DHAV')
+  firstStamp=None
+  lastStamp=None
+  unwrapped=0
+  lastDate=None
+  while 0<=pos and pos+_HEADER.size<=size:
+    magic, frameType, subtype, channel, subnumber, number, length, date, stamp, extLength, checksum = _HEADER.unpack_from( data, pos)
+    end=pos+length
+    if (length<_HEADER.size+_TRAILER.size or end>size or data[end-8:end-4]!=b'dhav'):
+      pos=data.find(b'DHAV', pos+4) # damaged or cut off frame, find the next one
+      continue
+    if (extLength):
+      _readExtensions( data, pos+_HEADER.size, extLength, info)
+    if (frameType in VIDEO_FRAMES):
+      if (lastStamp is not None and stamp<lastStamp and lastStamp-stamp>0x8000):
+        unwrapped+=0x10000 # the 16 bit ms counter wrapped
+      if (firstStamp is None):
+        firstStamp=stamp
+        info.startDatetime=frameDatetime( date)
+      lastStamp=stamp
+      lastDate=date
+      ms=unwrapped+stamp-firstStamp
+      info.timestamps.append( ms)
+      info.frames+=1
+      if (frameType==KEY_FRAME):
+        info.keyFrames+=1
+        info.keyTimestamps.append( ms)
+    pos=end if data[end:end+4]==b'DHAV' else data.find(b'DHAV', end)
+  if (not info.frames):
+    return None
+  info.endDatetime=frameDatetime( lastDate)
+  # the last frame lasts one frame interval too
+  if (info.frameRate):
+    frameTime=1000.0/info.frameRate
+  elif (info.frames>1):
+    frameTime=info.timestamps[-1]/(info.frames-1.0)
+  else:
+    frameTime=0.0
+  info.duration=(info.timestamps[-1]+frameTime)/1000.0
+  return info
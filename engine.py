@@ -0,0 +1,1667 @@
+# Dav2Mp4 engine
+# GPLv3 license
+#
+# Everything that converts and merges, without any UI. The tkinter GUI
+# (gui.py) and the command line (dav2mp4.py) both drive it through
+# runConversions( davFolder, mp4Folder, mergedFolder, Options(...), reporter)
+# See dav2mp4.py for the version history and technique notes.
+
+import sys, os, glob, re
+import subprocess
+import threading, queue, itertools, functools, bisect
+import datetime
+import collections
+import shutil
+import json
+import time
+import hashlib
+import sqlite3
+try:
+  import fcntl # copy-on-write clones, not on Windows
+except ImportError:
+  fcntl=None
+
+import subtitles
+import catalog
+import dhav
+import watch
+import metrics
+import backends
+
+# init_commands:
+# get path to executables:
+if getattr(sys, 'frozen', False):
+  # we are running in a pyinstaller bundle
+  bundle_dir = sys._MEIPASS
+else:
+  # we are running in a normal Python environment
+  bundle_dir = os.path.dirname(os.path.abspath(__file__))
+def findExecutable( name):
+  # prefer the ffmpeg.exe/ffprobe.exe shipped next to us (windows bundle),
+  # otherwise whatever is on the PATH (linux servers)
+  bundled=os.path.join( bundle_dir, name+'.exe')
+  if os.path.exists( bundled):
+    return bundled
+  return shutil.which( name) or bundled
+FFMPEG = findExecutable( 'ffmpeg')
+FFPROBE = findExecutable( 'ffprobe')
+DEFAULT_WORKERS = os.cpu_count() or 1 # simultaneous ffmpeg jobs
+
+# Most NVRs already record H.264 or H.265, those only need remuxing into MP4
+# which is many times faster than re-encoding. 'auto' copies those and
+# re-encodes anything else with the chosen profile.
+CODEC_MODES=('auto', 'copy', 'encode')
+COPY_VIDEO_CODECS=('h264', 'hevc')
+COPY_AUDIO_CODECS=('aac', 'mp3')
+ENCODE_PROFILES=collections.OrderedDict([
+  ('fast',     ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23']),
+  ('balanced', ['-c:v', 'libx264', '-preset', 'medium', '-crf', '20']),
+  ('quality',  ['-c:v', 'libx264', '-preset', 'slow', '-crf', '18', '-profile:v', 'main'])])
+DEFAULT_PROFILE='balanced'
+
+class Options:
+  # settings for one runConversions() call, filled in by the GUI or command line
+  def __init__(self, **settings):
+    self.convert=True # pass 1: DAV -> MP4 folder
+    self.merge=True # pass 2: merge contiguous MP4s, build timestamp subtitles
+    self.direct=False # instead of both: DAV groups straight to merged MP4s
+    self.workers=DEFAULT_WORKERS
+    self.codecMode='auto'
+    self.encodeProfile=DEFAULT_PROFILE
+    self.resume=True # skip work the journal shows as done
+    self.subtitleFormat='srt' # one of subtitles.FORMATS
+    self.pipe=False # single pass w each clip piped into the merge (needs direct)
+    self.burnTimestamps=False # draw the camera Datetime into the video while encoding
+    self.extract=None # (channel, start datetime, end datetime): export just that window
+    self.watch=None # seconds between polls: keep converting new DAVs until cancelled
+    self.watchRefresh=120 # seconds between re-merges of a channel's growing group
+    self.backend='ffmpeg' # how videos are probed and copied, one of backends.BACKENDS
+    for name, value in settings.items():
+      if not hasattr(self, name):
+        raise TypeError('unknown option '+name)
+      setattr(self, name, value)
+
+class Reporter:
+  # receives log lines and progress from the engine, the GUI and command line
+  # subclass it. Only called from the thread that called runConversions,
+  # which for the GUI is a worker thread rather than the Tk thread.
+  def log(self, text):
+    pass
+  def progress(self, percent):
+    pass
+  def idle(self):
+    pass # called every 0.1s while waiting on ffmpeg
+  def clearFileList(self):
+    pass
+  def addToFileList(self, file):
+    pass # a finished output
+  def fileFailed(self, file):
+    pass
+
+_reporter=Reporter()
+_summary=None
+_skipped=set() # the names in _summary['skipped'], so the duplicate checks don't scan it
+_metrics=metrics.Metrics() # per file/stage timings, see metrics.py
+_backend=backends.SubprocessBackend( FFMPEG, FFPROBE) # set for each run from Options.backend
+
+### Logging functions ##########################
+#   note Python-style prefers module level fns over Java-style never-instantiated static Class methods
+#   lines are timestamped and written by a background thread (metrics.LogWriter)
+_LOGFILE='dav2mp4-log.txt'
+_DEBUGFILE='dav2mp4-debug.txt'
+_logfile_f=None
+_debugfile_f=None
+
+def path( folder, file):
+  # use normpath to fix problems such as tk browser widget
+  # always returning Linux paths even on Windows systems
+  return( os.path.normpath(os.path.join( folder, file)))
+
+def log( text, folder=None):
+  # sends text to logfile, can send strings or bytes
+  global _logfile_f, _debugfile_f
+  if (folder):
+    closeLog()
+    _logfile_f=metrics.LogWriter( path( folder, _LOGFILE))
+    _debugfile_f=metrics.LogWriter( path( folder, _DEBUGFILE))
+  if (text):
+    try:
+      text=text.encode() # convert str to utf8
+    except AttributeError:
+      pass
+    _logfile_f.write( text)
+    _reporter.log(text.decode())
+    debug(b'---- '+text)
+
+def closeLog():
+  global _logfile_f, _debugfile_f
+  for f in (_logfile_f, _debugfile_f):
+    if (f):
+      f.close()
+  _logfile_f=_debugfile_f=None
+
+def debug( text):
+  # sends text to logfile, can send strings or bytes
+  if (text):
+    try:
+      text=text.encode() # convert str to utf8
+    except AttributeError:
+      pass
+    _debugfile_f.write( text)
+################################################
+
+### Conversion pool ############################
+# Runs several ffmpeg jobs at once on worker threads. Workers only run the
+# ffmpeg process, everything else (logging, UI updates) happens on the main
+# thread, which reads job events from pool.nextEvent():
+#   ('start', job)  ('progress', job, fraction 0.0-1.0)  ('done', job)
+# Jobs with the highest priority (we use the input file size) start first
+# so a long run doesn't end waiting on one big straggler.
+_activePool=None
+_cancelRequested=False # cancelConversions() was called during this run
+
+class FfmpegJob:
+  def __init__(self, name, command, outPath, duration=None, priority=0):
+    self.name=name
+    self.command=command
+    self.outPath=outPath
+    self.duration=duration # expected output duration in secs, for progress
+    self.priority=priority
+    self.returncode=None
+    self.output=[] # ffmpeg console output, for the debug log
+    self.method=None
+    self.weight=1 # how many files' worth of progress this job is
+    self.after=None # called on the worker once ffmpeg succeeds
+    self.error=None
+    self.cancelled=False
+    self.tempFiles=[] # removed once the job is over
+    self.started=None
+    self.seconds=0.0 # how long ffmpeg (or the file copy) took
+
+  @property
+  def ok(self):
+    return self.returncode==0 and self.error is None
+
+  def errorText(self):
+    return self.error or 'ffmpeg exit code '+str(self.returncode)
+
+  def run(self, pool):
+    try:
+      if (os.path.exists( self.outPath)):
+        # a new file rather than ffmpeg -y truncating the old one, which may
+        # be hard linked as a merged video (see placeFile)
+        os.remove( self.outPath)
+      self.runFfmpeg( pool)
+    finally:
+      for tempFile in self.tempFiles:
+        if os.path.exists( tempFile):
+          os.remove( tempFile)
+
+  def runFfmpeg(self, pool):
+    if callable(self.command):
+      # built on the worker so any probing doesn't hold up the main thread
+      self.command, self.method = self.command()
+    if (isinstance(self.command, backends.InProcess)):
+      self.runInProcess( pool)
+      self.finish( pool)
+      return
+    # -progress writes key=value lines to stdout, the console output is mixed
+    # into the same pipe, keep everything that isn't a progress line
+    command=self.command[:1]+['-nostats', '-progress', 'pipe:1']+self.command[1:]
+    self.started=time.time()
+    proc=subprocess.Popen( command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if not pool.register( self, proc):
+      proc.kill()
+    self.readOutput( pool, proc)
+    self.finish( pool)
+
+  def runInProcess(self, pool):
+    # the media backend's remux or concat on this worker, no ffmpeg process
+    cancel=backends.Cancel()
+    if not pool.register( self, cancel):
+      cancel.kill()
+    def progress( seconds):
+      if self.duration:
+        pool.events.put(('progress', self, min(seconds/self.duration, 1.0)))
+    self.started=time.time()
+    try:
+      self.returncode=self.command.run( progress, cancel)
+    except (OSError, ValueError) as e:
+      self.error=str(e)
+      self.returncode=1
+    self.seconds=time.time()-self.started
+    pool.unregister( self)
+
+  def readOutput(self, pool, proc):
+    for line in proc.stdout:
+      if line.startswith((b'out_time_us=', b'out_time_ms=')): # both are microseconds
+        if self.duration:
+          try:
+            seconds=int(line.split(b'=')[1])/1000000.0
+          except ValueError:
+            continue
+          pool.events.put(('progress', self, min(seconds/self.duration, 1.0)))
+      elif not re.match(rb'^\w+=\S*\s*$', line):
+        self.output.append(line.rstrip())
+    self.returncode=proc.wait()
+    self.seconds=time.time()-self.started
+    pool.unregister( self)
+
+  def finish(self, pool):
+    if pool.cancelled and self.returncode!=0:
+      self.cancelled=True
+      if os.path.exists( self.outPath):
+        # killed half way through, don't leave a broken video behind
+        os.remove( self.outPath)
+    elif self.returncode==0 and self.after:
+      self.after()
+
+class PipedMergeJob(FfmpegJob):
+  # single pass through pipes: each clip of a group is converted by its own
+  # ffmpeg writing MPEG-TS straight into the stdin of one ffmpeg that muxes
+  # the group's MP4. Nothing but the merged MP4 is written to disk and every
+  # clip is demuxed on its own, with its timestamps offset to follow on.
+  # command returns (mux command, [clip commands], method)
+  def runFfmpeg(self, pool):
+    muxCommand, clipCommands, self.method = self.command()
+    self.command=muxCommand
+    muxCommand=muxCommand[:1]+['-nostats', '-progress', 'pipe:1']+muxCommand[1:]
+    self.started=time.time()
+    proc=subprocess.Popen( muxCommand, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if not pool.register( self, proc):
+      proc.kill()
+    feeder=threading.Thread( target=self.feed, args=(pool, proc, clipCommands), daemon=True)
+    feeder.start()
+    self.readOutput( pool, proc)
+    feeder.join()
+    self.finish( pool)
+
+  def feed(self, pool, muxProc, clipCommands):
+    # one clip at a time, each writes into the mux's stdin pipe itself
+    try:
+      for clipCommand in clipCommands:
+        if (pool.cancelled or muxProc.poll() is not None):
+          break
+        clipProc=subprocess.Popen( clipCommand, stdout=muxProc.stdin, stderr=subprocess.PIPE)
+        out, err = clipProc.communicate()
+        if (clipProc.returncode!=0):
+          self.error='ffmpeg exit code '+str(clipProc.returncode)+' converting '+clipCommand[clipCommand.index('-i')+1]
+          self.output+=err.splitlines()
+          muxProc.kill()
+          break
+    finally:
+      muxProc.stdin.close()
+
+class ConversionPool:
+  def __init__(self, workers=None):
+    self.workers=max(1, workers or DEFAULT_WORKERS)
+    self.events=queue.Queue()
+    self.pending=0 # submitted jobs without a 'done' event yet
+    self.cancelled=False
+    self._jobs=queue.PriorityQueue()
+    self._seq=itertools.count() # keeps equal priorities in submit order
+    self._running={}
+    self._lock=threading.Lock()
+    self._threads=[]
+
+  def submit(self, job):
+    self.pending+=1
+    self._jobs.put((-job.priority, next(self._seq), job))
+
+  def nextEvent(self, timeout=None):
+    # returns the next job event, or None if nothing happened before timeout
+    # workers start on the first call so a batch of submits is ordered by priority
+    while len(self._threads)<min(self.workers, self.pending):
+      thread=threading.Thread( target=self._worker, daemon=True)
+      thread.start()
+      self._threads.append(thread)
+    try:
+      event=self.events.get( timeout=timeout)
+    except queue.Empty:
+      return None
+    if event[0]=='done':
+      self.pending-=1
+    return event
+
+  def register(self, job, proc):
+    with self._lock:
+      if self.cancelled:
+        return False
+      self._running[job]=proc
+      return True
+
+  def unregister(self, job):
+    with self._lock:
+      self._running.pop( job, None)
+
+  def cancel(self):
+    # stop handing out jobs and kill the ffmpeg processes that are running
+    with self._lock:
+      self.cancelled=True
+      procs=list(self._running.values())
+    for proc in procs:
+      proc.kill()
+
+  def close(self):
+    for thread in self._threads:
+      self._jobs.put((float('inf'), next(self._seq), None))
+    for thread in self._threads:
+      thread.join()
+    self._threads=[]
+
+  def _worker(self):
+    while True:
+      priority, seq, job = self._jobs.get()
+      if job is None:
+        return
+      if self.cancelled:
+        job.cancelled=True
+      else:
+        self.events.put(('start', job))
+        try:
+          job.run(self)
+        except Exception as e:
+          job.error=str(e)
+      self.events.put(('done', job))
+
+def cancelConversions():
+  # safe to call from any thread while runConversions is running, also
+  # before it has started its pool
+  global _cancelRequested
+  _cancelRequested=True
+  pool=_activePool # the run's thread clears it when the pool closes
+  if (pool):
+    pool.cancel()
+
+def resetCancel():
+  # call before starting the thread that runs runConversions, so a cancel
+  # that comes in while it starts up isn't lost. Each run clears it as it ends.
+  global _cancelRequested
+  _cancelRequested=False
+################################################
+
+### Probe cache ################################
+# ffprobe results live in memory and in a sidecar file in the MP4 folder.
+# Entries are keyed by path and only used while the file's size and mtime
+# still match, so each file gets probed once and a re-run over the same
+# folder doesn't start ffprobe at all.
+_PROBECACHE='Dav2Mp4-probecache.json'
+
+class ProbeCache:
+  VERSION=3 # bump when the probed fields change to drop old sidecars
+
+  def __init__(self):
+    self.entries={}
+    self.sidecar=None
+    self.dirty=False
+    self._lock=threading.Lock()
+
+  def load(self, folder):
+    # switch to the sidecar in folder, keeping what we already probed in memory
+    self.sidecar=path( folder, _PROBECACHE)
+    try:
+      with open( self.sidecar, 'r') as f:
+        saved=json.load(f)
+      if saved.get('version')==self.VERSION:
+        with self._lock:
+          for key, entry in saved['entries'].items():
+            self.entries.setdefault( key, entry)
+    except (OSError, ValueError, KeyError, AttributeError):
+      pass # missing or unreadable sidecar, start over
+
+  def save(self):
+    if not (self.sidecar and self.dirty):
+      return
+    with self._lock:
+      entries={key:entry for key, entry in self.entries.items() if os.path.exists(key)}
+      self.dirty=False
+    tmpFile=self.sidecar+'.tmp'
+    with open( tmpFile, 'w') as f:
+      json.dump({'version':self.VERSION, 'entries':entries}, f)
+    os.replace( tmpFile, self.sidecar)
+
+  def get(self, filePath):
+    # returns (key, stat, cached entry or None)
+    key=os.path.normcase(os.path.abspath( filePath))
+    stat=os.stat( key)
+    with self._lock:
+      entry=self.entries.get( key)
+    if entry and entry['size']==stat.st_size and entry['mtime']==stat.st_mtime_ns:
+      return key, stat, entry
+    return key, stat, None
+
+  def put(self, key, stat, entry):
+    entry['size']=stat.st_size
+    entry['mtime']=stat.st_mtime_ns
+    with self._lock:
+      self.entries[key]=entry
+      self.dirty=True
+
+_probeCache=ProbeCache()
+
+def probeFile( filePath):
+  # ffprobe info for a video file:
+  #   {'size':bytes, 'duration':secs, 'videoCodec':name, 'audioCodec':name}
+  # codecs are ffmpeg codec names ('h264', 'hevc', 'pcm_alaw'...) or None
+  # DAVs are read directly (dhav.py) for the camera's own frame timing,
+  # the media backend only probes the DAVs that don't parse and the MP4s
+  key, stat, entry = _probeCache.get( filePath)
+  if (entry is None and filePath.lower().endswith('.dav')):
+    started=time.time()
+    info=dhav.readFile( filePath)
+    if (info and info.videoCodec):
+      entry={'duration':info.duration, 'videoCodec':info.videoCodec, 'audioCodec':info.audioCodec}
+      _probeCache.put( key, stat, entry)
+      _metrics.record( 'probe', filePath, time.time()-started, stat.st_size, None, info.duration,
+                       method='dhav', codec=info.videoCodec)
+  if entry is None:
+    started=time.time()
+    entry=_backend.probe( filePath) # ffprobe, or libav in process (backends.py)
+    _probeCache.put( key, stat, entry)
+    _metrics.record( 'probe', filePath, time.time()-started, stat.st_size, None, entry['duration'],
+                     method=_backend.name, codec=entry['videoCodec'])
+  return entry
+
+def probedCodec( filePath):
+  # the video codec probeFile found, None if the file hasn't been probed
+  try:
+    key, stat, entry = _probeCache.get( filePath)
+  except OSError:
+    return None
+  return entry['videoCodec'] if entry else None
+
+def fileBytes( filePath):
+  try:
+    return os.path.getsize( filePath)
+  except OSError:
+    return 0
+
+def recordJob( stage, job, inPaths, codec=None):
+  # metrics for a job that ran, not for ones cancelled before they started
+  if (job.cancelled and job.returncode is None):
+    return
+  _metrics.record( stage, job.name, job.seconds, sum(fileBytes( inPath) for inPath in inPaths),
+                   fileBytes( job.outPath) if job.ok else None, job.duration, job.returncode,
+                   job.method, codec, job.ok)
+################################################
+
+### Job journal ################################
+# Records what each run has done in an SQLite file next to the log files:
+# each clip's conversion state with its input size/mtime and output
+# checksum, and each merge group's members. A re-run skips work the
+# journal shows as done with unchanged inputs and intact outputs, and
+# redoes anything that was running when a run crashed.
+_JOURNAL='Dav2Mp4-journal.sqlite'
+_CHECKSUM_SAMPLE=1024*1024
+
+def fileStamp( filePath):
+  stat=os.stat( filePath)
+  return [stat.st_size, stat.st_mtime_ns]
+
+def fileChecksum( filePath):
+  # sha1 of the size and the first and last MB, reading whole multi-GB
+  # outputs back on every run would cost as much as the copy itself
+  with open( filePath, 'rb') as f:
+    digest=hashlib.sha1( str(os.fstat( f.fileno()).st_size).encode())
+    digest.update( f.read( _CHECKSUM_SAMPLE))
+    f.seek( max(0, os.fstat( f.fileno()).st_size-_CHECKSUM_SAMPLE))
+    digest.update( f.read( _CHECKSUM_SAMPLE))
+  return digest.hexdigest()
+
+class Journal:
+  def __init__(self, folder):
+    self.db=sqlite3.connect( path( folder, _JOURNAL))
+    self.db.executescript('''
+      CREATE TABLE IF NOT EXISTS clips (input TEXT PRIMARY KEY, inputStamp TEXT, output TEXT,
+        state TEXT, outputSize INTEGER, outputChecksum TEXT, updated REAL);
+      CREATE TABLE IF NOT EXISTS groups (output TEXT PRIMARY KEY, members TEXT, memberStamps TEXT,
+        state TEXT, outputSize INTEGER, outputChecksum TEXT, updated REAL);''')
+
+  def close(self):
+    self.db.close()
+
+  def _isDone(self, row, stamps, outPath, extraPaths):
+    if (row is None or row[1]!='done' or row[0]!=json.dumps( stamps)):
+      return False
+    if not all(os.path.exists( extra) for extra in extraPaths):
+      return False
+    try:
+      return os.path.getsize( outPath)==row[2] and fileChecksum( outPath)==row[3]
+    except OSError:
+      return False
+
+  def _finished(self, outPath, ok):
+    if (ok):
+      return 'done', os.path.getsize( outPath), fileChecksum( outPath)
+    return 'failed', None, None
+
+  def clipDone(self, inPath, outPath):
+    try:
+      stamps=fileStamp( inPath)
+    except OSError:
+      return False
+    row=self.db.execute( 'SELECT inputStamp, state, outputSize, outputChecksum FROM clips WHERE input=? AND output=?',
+                         (inPath, outPath)).fetchone()
+    return self._isDone( row, stamps, outPath, [])
+
+  def startClip(self, inPath, outPath):
+    self.db.execute( 'INSERT OR REPLACE INTO clips VALUES (?,?,?,?,NULL,NULL,?)',
+                     (inPath, json.dumps( fileStamp( inPath)), outPath, 'running', time.time()))
+    self.db.commit()
+
+  def finishClip(self, inPath, outPath, ok):
+    self.db.execute( 'UPDATE clips SET state=?, outputSize=?, outputChecksum=?, updated=? WHERE input=?',
+                     self._finished( outPath, ok)+(time.time(), inPath))
+    self.db.commit()
+
+  def groupDone(self, outPath, memberPaths, extraPaths=()):
+    # extraPaths: other outputs that must still exist, the subtitle file
+    try:
+      stamps=[fileStamp( member) for member in memberPaths]
+    except OSError:
+      return False
+    row=self.db.execute( 'SELECT memberStamps, state, outputSize, outputChecksum FROM groups WHERE output=? AND members=?',
+                         (outPath, json.dumps( memberPaths))).fetchone()
+    return self._isDone( row, stamps, outPath, extraPaths)
+
+  def startGroup(self, outPath, memberPaths):
+    self.db.execute( 'INSERT OR REPLACE INTO groups VALUES (?,?,?,?,NULL,NULL,?)',
+                     (outPath, json.dumps( memberPaths), json.dumps([fileStamp( member) for member in memberPaths]),
+                      'running', time.time()))
+    self.db.commit()
+
+  def finishGroup(self, outPath, ok):
+    self.db.execute( 'UPDATE groups SET state=?, outputSize=?, outputChecksum=?, updated=? WHERE output=?',
+                     self._finished( outPath, ok)+(time.time(), outPath))
+    self.db.commit()
+
+_journal=None
+################################################
+
+def runJobs( jobs, onStart, onDone, progress, maxProgress, workers):
+  # run FfmpegJobs on a ConversionPool, onStart(job) and onDone(job) are
+  # called on this thread as the jobs start and finish, onDone can return
+  # more jobs to run
+  # returns (progress, cancelled)
+  global _activePool
+  pool=_activePool=ConversionPool( workers)
+  if (_cancelRequested):
+    pool.cancel()
+  running={} # job -> fraction done
+  try:
+    for job in jobs:
+      pool.submit( job)
+    if (jobs):
+      log('running '+str(min(pool.workers, len(jobs)))+' ffmpeg jobs at once')
+    while pool.pending:
+      event=pool.nextEvent(0.1)
+      if (event is None):
+        _reporter.idle() # keep the window alive while ffmpeg works
+        continue
+      job=event[1]
+      if (event[0]=='start'):
+        onStart( job)
+        running[job]=0.0
+      elif (event[0]=='progress'):
+        running[job]=event[2]
+      elif (event[0]=='done'):
+        running.pop( job, None)
+        debug(str(job.command))
+        debug(b'\n'.join(job.output))
+        progress+=job.weight
+        for newJob in onDone( job) or []:
+          pool.submit( newJob) # e.g. a merge whose clips are now all converted
+      _reporter.progress( 100.0*(progress+sum(job.weight*fraction for job, fraction in running.items()))/maxProgress)
+  finally:
+    if (pool.pending):
+      pool.cancel() # leaving early, don't leave ffmpeg running
+    pool.close()
+    _activePool=None
+  if (pool.cancelled):
+    log('cancelled')
+    _summary['cancelled']=True
+  return progress, pool.cancelled
+
+def samePath( path1, path2):
+  return os.path.normcase(os.path.abspath( path1))==os.path.normcase(os.path.abspath( path2))
+
+def checkFolders( davFolder, mp4Folder, mergedFolder, options):
+  # returns an error message if a folder the chosen passes need is missing
+  if (options.watch and not (davFolder and mp4Folder and mergedFolder)):
+    return "Select the DAV, MP4 and merged folders to watch"
+  elif (options.watch and samePath( mp4Folder, mergedFolder)):
+    return "Watching replaces merged videos as they grow, use a merged folder apart from the MP4s"
+  elif (options.watch):
+    return None
+  elif (options.extract and not (davFolder and mergedFolder)):
+    return "Select the DAV folder and a folder to save the extracted MP4"
+  elif (options.extract):
+    return None
+  elif ((options.direct or options.convert) and not davFolder):
+    return "Select folder with DAV video files to convert"
+  elif (options.direct and not mergedFolder):
+    return "Select folder to save merged MP4 video files"
+  elif (options.direct):
+    return None
+  elif (options.convert and not mp4Folder):
+    return "Select folder to save MP4 video files"
+  elif (options.merge and not mp4Folder):
+    return "Select folder with MP4 or AVI video files to merge"
+  elif (options.merge and not mergedFolder):
+    return "Select folder to save merged MP4 video files"
+  elif (options.merge and samePath( mp4Folder, mergedFolder)):
+    return "Use a merged folder apart from the MP4s, a single clip is placed there under its own name"
+  return None
+
+def runConversions( davFolder, mp4Folder, mergedFolder, options=None, reporter=None):
+  # runs the passes selected in options, returns a summary dict:
+  #   converted, merged, skipped, failed: lists of filenames
+  #   resumed: outputs the journal showed were already done
+  #   cancelled: True if cancelConversions() stopped the run, seconds: run time
+  #   metrics: time, bytes and throughput per stage, channel and codec (metrics.py)
+  global _reporter, _summary, _skipped, _journal, _cancelRequested, _backend
+  options=options or Options()
+  _backend=backends.create( options.backend, FFMPEG, FFPROBE)
+  _reporter=reporter or Reporter()
+  _summary={'converted':[], 'merged':[], 'skipped':[], 'failed':[], 'resumed':[],
+            'cancelled':False, 'seconds':0.0}
+  _skipped=set()
+  startTime=time.time()
+  log( "starting conversion", mp4Folder or mergedFolder)
+  _metrics.open( mp4Folder or mergedFolder)
+  _journal=Journal( mp4Folder or mergedFolder)
+  try:
+    if (options.watch):
+      runWatch( davFolder, mp4Folder, mergedFolder, options)
+    elif (options.extract):
+      runExtract( davFolder, mergedFolder, options)
+    elif (options.direct):
+      runDirectMerge( davFolder, mergedFolder, options)
+    else:
+      runPasses( davFolder, mp4Folder, mergedFolder, options)
+  finally:
+    _summary['seconds']=round(time.time()-startTime, 3)
+    _summary['converted'].sort() # finish order depends on the pool
+    _summary['merged'].sort() # and so do merges of different channels
+    _summary['metrics']=_metrics.summary()
+    log('---- summary: '+str(_summary['seconds'])+'s')
+    for line in _metrics.summaryLines():
+      log( line)
+    _metrics.close()
+    _journal.close()
+    closeLog()
+    _cancelRequested=False
+  return _summary
+
+def runPasses( davFolder, mp4Folder, mergedFolder, options):
+  if (options.convert and options.merge):
+    runPipeline( davFolder, mp4Folder, mergedFolder, options)
+  elif (options.convert):
+    # convert all dav to mp4
+    log('---- converting DAV to MP4')
+    _reporter.progress(0.0)
+    _reporter.clearFileList()
+    davFiles=sorted(filter(lambda x: x.endswith(('.dav','.DAV')), os.listdir(davFolder)))
+    _probeCache.load( mp4Folder)
+    try:
+      winners=resolveDuplicates( davFiles, davFolder)
+      jobs, resumed = convertJobs( winners, davFolder, mp4Folder, options)
+      runJobs( jobs, convertStart, convertDone, len(davFiles)-len(winners)+len(resumed),
+               max(1, len(davFiles)), options.workers)
+    finally:
+      _probeCache.save()
+  elif (options.merge):
+    # merge adjacent mp4s, build datetime subtitles
+    log('---- Merging consecutive videos')
+    _probeCache.load( mp4Folder)
+    try:
+      mp4Files=sorted(filter(lambda x: x.endswith(('.mp4','.MP4','.avi','.AVI')), os.listdir(mp4Folder)))
+      fileSize=lambda file: os.path.getsize( path( mp4Folder, file))
+      # the DAVs the MP4s came from, if they're still in davFolder
+      davFiles=os.listdir(davFolder) if os.path.isdir(davFolder) else []
+      davNames={re.sub( r'\.[dD][aA][vV]$', '.mp4', file): file
+                for file in davFiles if file.endswith(('.dav','.DAV'))}
+      # channels merge side by side, each one a group at a time
+      channels=ChannelMerges()
+      jobs=[]
+      for run in planRuns( mp4Files):
+        for mergeList in splitRun( run, fileSize):
+          job=MergeJob( mergeList, mp4Folder, mergedFolder, options.subtitleFormat,
+                        clipSources( mergeList, mp4Folder, davFolder, davNames))
+          if not (options.resume and mergeResumed( job)):
+            jobs+=channels.add( job)
+      def onDone( job):
+        mergeDone( job)
+        return channels.done( job)
+      runJobs( jobs, mergeStart, onDone, 0, max(1, len(mp4Files)), options.workers)
+    finally:
+      _probeCache.save() # keep what we probed even if the merge fails
+  if (options.merge and not _summary['cancelled']):
+    log('finished')
+    _reporter.progress(0.0)
+    _reporter.clearFileList()
+    for mp4file in sorted(filter(lambda x: x.endswith('.mp4'), os.listdir(mergedFolder))):
+      _reporter.addToFileList( mp4file)
+
+def runPipeline( davFolder, mp4Folder, mergedFolder, options):
+  # convert and merge overlapped: the merge groups are planned from the DAV
+  # filenames up front and each group's concat and subtitles are dispatched
+  # to the pool as soon as its clips are converted, while the other
+  # conversions keep running
+  log('---- converting DAV to MP4 and merging consecutive videos')
+  _reporter.progress(0.0)
+  _reporter.clearFileList()
+  davFiles=sorted(filter(lambda x: x.endswith(('.dav','.DAV')), os.listdir(davFolder)))
+  _probeCache.load( mp4Folder)
+  allDavFiles=davFiles
+  davFiles=resolveDuplicates( davFiles, davFolder) # only the winners are converted
+  mp4Name=lambda file: re.sub( r'\.[dD][aA][vV]$', '.mp4', file)
+  davNames={mp4Name( file): file for file in davFiles}
+  fileSize=lambda file: os.path.getsize( path( mp4Folder, file))
+  trackers={} # DAV filename -> RunTracker of its run
+  runTrackers=[] # the same RunTrackers in planRuns order, so each channel's groups queue in time order
+  channels=ChannelMerges()
+  for run in planRuns( davFiles):
+    tracker=RunTracker( run, fileSize, mp4Name)
+    runTrackers.append( tracker)
+    for slot in run:
+      for file in slot:
+        trackers[file]=tracker
+  def mergeJobs( tracker):
+    jobs=[]
+    for mergeList in tracker.readyMergeLists():
+      job=MergeJob( mergeList, mp4Folder, mergedFolder, options.subtitleFormat,
+                    clipSources( mergeList, mp4Folder, davFolder, davNames))
+      if not (options.resume and mergeResumed( job)):
+        jobs+=channels.add( job)
+    return jobs
+  def onStart( job):
+    if (isinstance(job, MergeJob)):
+      mergeStart( job)
+    else:
+      convertStart( job)
+  def onDone( job):
+    if (isinstance(job, MergeJob)):
+      mergeDone( job)
+      return channels.done( job)
+    convertDone( job)
+    if (job.name not in trackers):
+      return [] # not merged, planRuns skipped it
+    trackers[job.name].finished( job.name, job.ok)
+    return mergeJobs( trackers[job.name])
+  try:
+    jobs, resumed = convertJobs( davFiles, davFolder, mp4Folder, options)
+    for file in resumed:
+      if (file in trackers):
+        trackers[file].finished( file)
+    for tracker in runTrackers:
+      jobs+=mergeJobs( tracker)
+    runJobs( jobs, onStart, onDone, len(allDavFiles)-len(davFiles)+len(resumed),
+             max(1, 2*len(allDavFiles)), options.workers)
+  finally:
+    _probeCache.save()
+
+def convertJobs( davFiles, davFolder, mp4Folder, options):
+  # returns (conversion jobs, DAV files the journal shows are already converted)
+  jobs=[]
+  resumed=[]
+  for file in davFiles:
+    mp4file = re.sub( r'\.[dD][aA][vV]$', '.mp4', file)
+    davPath=path(davFolder, file)
+    if (options.resume and _journal.clipDone( davPath, path(mp4Folder, mp4file))):
+      log('already converted '+file)
+      _summary['resumed'].append( mp4file)
+      _reporter.addToFileList( mp4file)
+      resumed.append( file)
+      continue
+    clip=catalog.parseClip( file)
+    stamps=[(clip.startDatetime, None)] if (options.burnTimestamps and clip) else None
+    command=functools.partial( convertDav2Mp4Command, davPath, path(mp4Folder, mp4file),
+                               options.codecMode, options.encodeProfile, stamps)
+    job=FfmpegJob( file, command, path(mp4Folder, mp4file), namedDuration( file),
+                   os.path.getsize( davPath))
+    job.inPath=davPath
+    jobs.append( job)
+  return jobs, resumed
+
+def convertStart( job):
+  log('converting '+job.name+" to mp4...")
+  _journal.startClip( job.inPath, job.outPath)
+
+def convertDone( job):
+  if (not job.cancelled or job.returncode is not None):
+    _journal.finishClip( job.inPath, job.outPath, job.ok)
+  recordJob( 'convert', job, [job.inPath], probedCodec( job.inPath))
+  if (job.ok):
+    log('converted '+job.name+(' (stream copy)' if job.method=='copy' else ' (re-encoded)'))
+    _summary['converted'].append( os.path.basename(job.outPath))
+    _reporter.addToFileList( os.path.basename(job.outPath))
+  elif (not job.cancelled):
+    log('error converting '+job.name+' ('+job.errorText()+')')
+    _summary['failed'].append( job.name)
+    _reporter.fileFailed( job.name)
+
+def mergeResumed( job):
+  # true if the journal shows this merge was already done
+  if (_journal.groupDone( job.outPath, job.memberPaths, [job.subtitlePath])):
+    log('already merged '+job.name)
+    _summary['resumed'].append( job.name)
+    return True
+  return False
+
+def mergeStart( job):
+  for file in job.mergeList:
+    log('merging '+file+'...')
+  startGroup( job)
+
+def startGroup( job):
+  # journal a merge as it starts, a member gone since the folder was read
+  # fails just this job
+  try:
+    _journal.startGroup( job.outPath, job.memberPaths)
+  except OSError as e:
+    job.error=str(e)
+
+def mergeDone( job, stage=None, codec=None):
+  # stage for the metrics, a concat of MP4s (or the copy of a single one) by default
+  if (not job.cancelled or job.returncode is not None):
+    _journal.finishGroup( job.outPath, job.ok)
+  recordJob( stage or ('concat' if len(job.mergeList)>1 else 'copy'), job, job.memberPaths, codec)
+  if (job.ok):
+    if (len(job.mergeList)>1):
+      log('merged to '+job.name)
+    log('built timestamp subtitle file '+os.path.basename( job.subtitlePath))
+    _summary['merged'].append( job.name)
+  elif (not job.cancelled):
+    log('error merging to '+job.name+' ('+job.errorText()+')')
+    _summary['failed'].append( job.name)
+    _reporter.fileFailed( job.name)
+
+def runDirectMerge( davFolder, mergedFolder, options):
+  # single pass: each contiguous group of DAVs goes through one ffmpeg
+  # (concat demuxer over the DAVs) straight to its merged MP4,
+  # no intermediate per-clip MP4s
+  log('---- converting and merging DAVs in one pass')
+  _reporter.progress(0.0)
+  _reporter.clearFileList()
+  _probeCache.load( mergedFolder)
+  davFiles=sorted(filter(lambda x: x.endswith(('.dav','.DAV')), os.listdir(davFolder)))
+  allDavFiles=davFiles
+  davFiles=resolveDuplicates( davFiles, davFolder)
+  fileSize=lambda file: os.path.getsize( path( davFolder, file))
+  jobs=[]
+  progress=len(allDavFiles)-len(davFiles)
+  for run in planRuns( davFiles):
+    for mergeList in splitRun( run, fileSize):
+      mergedMp4File=mergedFileName( mergeList)
+      jobClass=FfmpegJob
+      command=functools.partial( directMergeCommand, mergeList, davFolder, mergedFolder,
+                                 options.codecMode, options.encodeProfile, options.burnTimestamps)
+      if (options.pipe and len(mergeList)>1):
+        jobClass=PipedMergeJob
+        command=functools.partial( pipedMergeCommands, mergeList, davFolder, mergedFolder,
+                                   options.codecMode, options.encodeProfile, options.burnTimestamps)
+      job=jobClass( mergedMp4File, command, path( mergedFolder, mergedMp4File),
+                    sum(namedDuration( file) for file in mergeList),
+                    sum(fileSize( file) for file in mergeList))
+      job.weight=len(mergeList)
+      job.mergeList=mergeList
+      job.memberPaths=[path( davFolder, file) for file in mergeList]
+      job.tempFiles=[] if options.pipe else [mergeListFile( mergeList, mergedFolder)]
+      # the subtitles need every clip's duration, probe them on the worker too
+      job.subtitlePath=path( mergedFolder, subtitleFileName( mergeList, options.subtitleFormat))
+      job.after=functools.partial( writeSubtitles, mergeList, davFolder, job.subtitlePath,
+                                   options.subtitleFormat)
+      if (options.resume and mergeResumed( job)):
+        _reporter.addToFileList( mergedMp4File)
+        progress+=len(mergeList)
+        continue
+      jobs.append( job)
+  def directStart( job):
+    log('converting and merging '+str(job.weight)+' DAVs to '+job.name+'...')
+    startGroup( job)
+  def directDone( job):
+    mergeDone( job, 'pipe' if isinstance(job, PipedMergeJob) else 'direct', probedCodec( job.memberPaths[0]))
+    if (job.ok):
+      _reporter.addToFileList( job.name)
+  try:
+    progress, cancelled = runJobs( jobs, directStart, directDone, progress,
+                                   max(1, len(allDavFiles)), options.workers)
+  finally:
+    _probeCache.save()
+  if (not cancelled):
+    log('finished')
+    _reporter.progress(0.0)
+
+def runExtract( davFolder, mergedFolder, options):
+  # time window export: only the channel's DAVs that overlap the window are
+  # read, found from their filenames in the catalog, and go through one
+  # ffmpeg (concat demuxer, first and last clips trimmed) to one MP4 + subtitles
+  channelName, windowStart, windowEnd = options.extract
+  log('---- extracting '+channelName+' '+str(windowStart)+' to '+str(windowEnd))
+  _reporter.progress(0.0)
+  _reporter.clearFileList()
+  clips=catalog.Catalog.scan( davFolder, ('.dav','.DAV'))
+  channels=clips.named( channelName)
+  if (len(channels)!=1):
+    log('error: '+channelName+(' matches channels '+', '.join(channel.prefix for channel in channels)
+                               if channels else ' matches no channel'))
+    _summary['failed'].append( channelName)
+    return
+  slots=[]
+  for clip in clips.overlapping( channels[0].prefix, windowStart, windowEnd):
+    if (slots and catalog.sameTimeRange( clip, slots[-1][0])):
+      slots[-1].append( clip)
+    else:
+      slots.append([clip])
+  if (not slots):
+    log('no '+channels[0].prefix+' clips between '+str(windowStart)+' and '+str(windowEnd))
+    return
+  _probeCache.load( mergedFolder)
+  files=[pickDuplicate( [clip.name for clip in slot], davFolder) for slot in slots]
+  job=ExtractJob( files, davFolder, mergedFolder, windowStart, windowEnd, options)
+  def extractStart( job):
+    log('extracting from '+str(len(files))+' DAVs to '+job.name+'...')
+  def extractDone( job):
+    recordJob( 'extract', job, [path( davFolder, file) for file in files], probedCodec( path( davFolder, files[0])))
+    if (job.ok):
+      log('extracted '+job.name+(' (stream copy)' if job.method=='copy' else ' (re-encoded)'))
+      log('built timestamp subtitle file '+os.path.basename( job.subtitlePath))
+      _summary['merged'].append( job.name)
+      _reporter.addToFileList( job.name)
+    elif (not job.cancelled):
+      log('error extracting '+job.name+' ('+job.errorText()+')')
+      _summary['failed'].append( job.name)
+      _reporter.fileFailed( job.name)
+  try:
+    progress, cancelled = runJobs( [job], extractStart, extractDone, 0, job.weight, 1)
+  finally:
+    _probeCache.save()
+  if (not cancelled):
+    log('finished')
+    _reporter.progress(0.0)
+
+class ExtractJob(FfmpegJob):
+  # one channel's clips overlapping [windowStart, windowEnd] to a single MP4
+  # and its subtitles. The trim points are worked out on the pool worker,
+  # with the DAVs' own key frame times when the video is stream copied.
+  def __init__(self, files, davFolder, mergedFolder, windowStart, windowEnd, options):
+    first=catalog.parseClip( files[0])
+    name=first.prefix+windowStart.strftime('%Y%m%d%H%M%S')+'_'+windowEnd.strftime('%Y%m%d%H%M%S')
+    FfmpegJob.__init__( self, name+'.mp4', self.extractCommand, path( mergedFolder, name+'.mp4'),
+                        (windowEnd-windowStart).total_seconds()+1)
+    self.files=files
+    self.davFolder=davFolder
+    self.windowStart=catalog.seconds( windowStart)
+    self.windowEnd=catalog.seconds( windowEnd)+1 # end of the last second
+    self.mode=options.codecMode
+    self.profile=options.encodeProfile
+    self.burn=options.burnTimestamps
+    self.weight=len(files)
+    self.inpoint=0.0 # seconds into the first clip
+    self.outpoint=None # seconds into the last clip, None for its end
+    self.subtitleFormat=options.subtitleFormat
+    self.subtitlePath=path( mergedFolder, name+'.'+options.subtitleFormat)
+    self.tempFiles=[path( mergedFolder, 'Dav2Mp4-extractlist-'+name+'.txt')]
+    self.after=self.writeSubtitles
+
+  def extractCommand(self):
+    firstPath=path( self.davFolder, self.files[0])
+    first=catalog.parseClip( self.files[0])
+    last=catalog.parseClip( self.files[-1])
+    self.inpoint=float(max(0, self.windowStart-first.start))
+    if (self.windowEnd<=last.end):
+      self.outpoint=float(self.windowEnd-last.start)
+    stamps=self.timeline() if self.burn else None
+    method, video, audio, tag = convertSettings( firstPath, self.mode, self.profile, stamps)
+    if (self.inpoint and method=='copy'):
+      # a stream copy can only start on a key frame, start on the one before
+      # so the subtitles line up with what the video really shows
+      info=dhav.readFile( firstPath)
+      if (info and info.keyTimestamps):
+        at=bisect.bisect_right( info.keyTimestamps, int(self.inpoint*1000))
+        self.inpoint=info.keyTimestamps[max(0, at-1)]/1000.0
+    with open( self.tempFiles[0], 'w') as f:
+      for n, file in enumerate(self.files):
+        f.write('file \''+path( self.davFolder, file)+'\'\n')
+        if (n==0 and self.inpoint):
+          f.write('inpoint '+str(self.inpoint)+'\n')
+        if (n==len(self.files)-1 and self.outpoint is not None):
+          f.write('outpoint '+str(self.outpoint)+'\n')
+    # ffmpeg, the trims are concat list directives
+    command=backends.ffmpegCommand( FFMPEG, backends.concatInput( self.tempFiles[0]), self.outPath,
+                                    video or backends.copyVideo( tag), audio)
+    return command, method
+
+  def writeSubtitles(self):
+    writeSubtitleFile( self.subtitlePath, self.timeline(), self.subtitleFormat)
+
+  def timeline(self):
+    # (start Datetime, seconds) of each clip's trimmed span,
+    # the display starts at the first clip's inpoint
+    clips=[]
+    for n, file in enumerate(self.files):
+      clip=catalog.parseClip( file)
+      duration=probeFile( path( self.davFolder, file))['duration']
+      start=self.inpoint if n==0 else 0.0
+      end=duration if (n<len(self.files)-1 or self.outpoint is None) else min(duration, self.outpoint)
+      clips.append( (clip.startDatetime+datetime.timedelta(seconds=int(start)), max(0.0, end-start)))
+    return clips
+
+### Watch mode #################################
+# Keeps converting while an NVR exports into the DAV folder: each poll
+# hands the DAVs that stopped growing to one long lived pool, and every
+# channel's merged videos follow its converted clips. Finished groups
+# are merged once, the channel's newest group is re-merged at most every
+# watchRefresh seconds as clips extend it, and the outputs it replaces
+# are removed.
+class ChannelMerger:
+  # one channel's clips and what has been merged from them. The DAVs go into
+  # a growing RunTracker in time order as they're found, gaps as empty
+  # slots, so each conversion only moves its cursor on. A DAV older than the
+  # ones before it (a late export or _1 twin) rebuilds the tracker.
+  def __init__(self, prefix, davFolder, mp4Folder, mergedFolder, options):
+    self.prefix=prefix
+    self.davFolder=davFolder
+    self.mp4Folder=mp4Folder
+    self.mergedFolder=mergedFolder
+    self.options=options
+    self.clips=[] # DAV names in the order they were found
+    self.davNames={} # converted clip name -> the DAV it came from
+    self.sizes={} # converted clip name -> bytes, each MP4 is stat'ed once
+    self.tracker=RunTracker( [], self.fileSize, self.mp4Name, growing=True)
+    self.last=None # Clip of the tracker's last slot
+    self.ready=[] # closed merge lists, oldest first, until they're merged
+    self.merged={} # output name -> merge list it holds
+    self.changed=False
+    self.job=None # merge running on the pool
+    self.lastMerge=0.0 # when the newest group was last merged
+
+  def mp4Name(self, file):
+    return re.sub( r'\.[dD][aA][vV]$', '.mp4', file)
+
+  def fileSize(self, file):
+    if (file not in self.sizes):
+      self.sizes[file]=os.path.getsize( path( self.mp4Folder, file))
+    return self.sizes[file]
+
+  def add(self, davFile):
+    # a DAV of this channel that is being converted, or already was
+    clip=catalog.parseClip( davFile)
+    self.clips.append( davFile)
+    self.davNames[self.mp4Name( davFile)]=davFile
+    self.changed=True
+    if (self.last and catalog.sameTimeRange( clip, self.last) and self.tracker.cursor<len(self.tracker.slots)):
+      self.tracker.slots[-1].append( davFile)
+    elif (self.last is None or clip.start>self.last.start):
+      if (self.last and not catalog.areContiguous( clip, self.last)):
+        self.tracker.extend([[]])
+      self.tracker.extend([[davFile]])
+    else:
+      self.rebuild()
+      return
+    self.last=clip
+
+  def finished(self, davFile, ok):
+    self.tracker.finished( davFile, ok)
+    self.changed=True
+
+  def rebuild(self):
+    channel=catalog.Channel( self.prefix, [catalog.parseClip( file) for file in self.clips])
+    slots=[]
+    for run in channel.runs():
+      slots+=([[]] if slots else [])+[[clip.name for clip in slot] for slot in run]
+    tracker=RunTracker( slots, self.fileSize, self.mp4Name, growing=True)
+    tracker.results=self.tracker.results
+    self.tracker=tracker
+    self.last=channel.clips[-1]
+    self.ready=[]
+
+  def nextJob(self, now):
+    # the next merge to run or None, the newest group waits for the refresh
+    if (self.job or not self.changed):
+      return None
+    self.ready+=self.tracker.readyMergeLists()
+    mergeLists=self.ready+([self.tracker.mergeList] if self.tracker.mergeList else [])
+    for n, mergeList in enumerate(mergeLists):
+      name=mergedFileName( mergeList)
+      if (self.merged.get( name)==mergeList):
+        self.markMerged( name, mergeList)
+        continue
+      if (self.coveredBy( mergeList)):
+        continue # cut short by a rebuild, wait for the clip it is waiting on
+      if (n==len(mergeLists)-1):
+        if (now-self.lastMerge<self.options.watchRefresh):
+          return None # still growing, keep changed for the next poll
+        self.lastMerge=now
+      job=MergeJob( list(mergeList), self.mp4Folder, self.mergedFolder, self.options.subtitleFormat,
+                    clipSources( mergeList, self.mp4Folder, self.davFolder, self.davNames))
+      if (self.options.resume and mergeResumed( job)):
+        self.markMerged( job.name, job.mergeList)
+        continue
+      self.job=job
+      return job
+    self.changed=False
+    return None
+
+  def coveredBy(self, mergeList):
+    # the merged output that mergeList is the start of, None if there's none.
+    # After a rebuild the open list stops at the late clip until it is
+    # converted, merging that would only shrink the output.
+    for name, merged in self.merged.items():
+      if (len(merged)>len(mergeList) and merged[:len(mergeList)]==mergeList):
+        return name
+    return None
+
+  def markMerged(self, name, mergeList):
+    self.merged[name]=list(mergeList) # the open list keeps growing
+    if (mergeList in self.ready):
+      self.ready.remove( mergeList) # closed, it won't change again
+
+  def done(self, job):
+    self.job=None
+    if (not job.ok):
+      return
+    self.markMerged( job.name, job.mergeList)
+    keep=(job.name, os.path.basename( job.subtitlePath))
+    # earlier outputs whose clips this one all holds, and ones left by a
+    # previous run that started at the same clip
+    first=catalog.parseClip( job.mergeList[0])
+    stale=re.compile( re.escape( first.prefix+first.startTime)+r'[-_ ]\d{14}(_\d+)?\.\w+$')
+    clips=set(job.mergeList)
+    for name, mergeList in list(self.merged.items()):
+      if (name!=job.name and clips.issuperset( mergeList)):
+        del self.merged[name]
+        removeMerged( name, self.mergedFolder)
+        subtitleFile=subtitleFileName( mergeList, self.options.subtitleFormat)
+        if (subtitleFile not in keep):
+          removeMerged( subtitleFile, self.mergedFolder)
+    tracked=set(self.merged)|set(subtitleFileName( mergeList, self.options.subtitleFormat)
+                                 for mergeList in self.merged.values())
+    for name in os.listdir( self.mergedFolder):
+      if (name not in keep and name not in tracked and stale.match( name)):
+        removeMerged( name, self.mergedFolder)
+
+def removeMerged( name, mergedFolder):
+  # remove a merged video, or subtitles, that a re-merge has replaced
+  if (os.path.exists( path( mergedFolder, name))):
+    os.remove( path( mergedFolder, name))
+    log('removed '+name+', replaced by a longer merge')
+  if (name in _summary['merged']):
+    _summary['merged'].remove( name)
+
+def runWatch( davFolder, mp4Folder, mergedFolder, options):
+  global _activePool
+  log('---- watching '+davFolder+' for new DAVs every '+str(options.watch)+'s, cancel to stop')
+  _reporter.progress(0.0)
+  _reporter.clearFileList()
+  folderWatch=watch.FolderWatch( davFolder)
+  mergers={} # channel prefix -> ChannelMerger
+  _probeCache.load( mp4Folder)
+  pool=_activePool=ConversionPool( options.workers)
+  if (_cancelRequested):
+    pool.cancel()
+  def found( file):
+    # a new DAV, its channel's merges wait for it
+    clip=catalog.parseClip( file)
+    if (clip is None):
+      log('not merging '+file+', no start and end times in the filename')
+      return
+    if (clip.prefix not in mergers):
+      mergers[clip.prefix]=ChannelMerger( clip.prefix, davFolder, mp4Folder, mergedFolder, options)
+    mergers[clip.prefix].add( file)
+  def converted( file, ok=True):
+    clip=catalog.parseClip( file)
+    if (clip):
+      mergers[clip.prefix].finished( file, ok)
+  def submitMerges():
+    for prefix in sorted(mergers):
+      job=mergers[prefix].nextJob( time.time())
+      if (job):
+        pool.submit( job)
+  nextPoll=0.0
+  try:
+    while not pool.cancelled:
+      if (time.time()>=nextPoll):
+        nextPoll=time.time()+options.watch
+        # a _1 twin arriving in a later poll is settled by the merge instead
+        jobs, resumed = convertJobs( resolveDuplicates( folderWatch.poll(), davFolder),
+                                     davFolder, mp4Folder, options)
+        for file in sorted([job.name for job in jobs]+resumed):
+          found( file)
+        for job in jobs:
+          pool.submit( job)
+        for file in resumed:
+          converted( file)
+        submitMerges()
+        _probeCache.save()
+      event=pool.nextEvent( min(1.0, max(0.1, nextPoll-time.time())))
+      if (event is None):
+        _reporter.idle()
+        continue
+      job=event[1]
+      if (event[0]=='start'):
+        (mergeStart if isinstance(job, MergeJob) else convertStart)( job)
+      elif (event[0]=='done'):
+        debug(str(job.command))
+        debug(b'\n'.join(job.output))
+        if (isinstance(job, MergeJob)):
+          mergeDone( job)
+          mergers[job.channel].done( job)
+        else:
+          convertDone( job)
+          if (job.ok or not job.cancelled):
+            converted( job.name, job.ok)
+        submitMerges()
+  finally:
+    if (pool.pending):
+      pool.cancel()
+    pool.close()
+    _activePool=None
+    _probeCache.save()
+  log('cancelled')
+  _summary['cancelled']=True
+################################################
+
+def convertSettings( davPath, mode='auto', profile=DEFAULT_PROFILE, stamps=None):
+  # returns (method, video, audio, tag) for converting a DAV: method 'copy'
+  # with video None, or 'encode' with video the ffmpeg encoding options;
+  # audio 'copy' or 'aac'; tag 'hvc1' for copied HEVC, so QuickTime and
+  # browsers play it, else None
+  # probes the DAV, so call it from a pool worker rather than the UI thread
+  # stamps: (start Datetime, seconds) of each clip in the output to burn the
+  # camera Datetime into the picture, which means re-encoding
+  try:
+    probe=probeFile( davPath)
+  except (OSError, ValueError):
+    probe={'videoCodec':None, 'audioCodec':None} # let ffmpeg work it out
+  if (not stamps and (mode=='copy' or (mode=='auto' and probe['videoCodec'] in COPY_VIDEO_CODECS))):
+    method='copy'
+    video=None
+    tag='hvc1' if (probe['videoCodec']=='hevc') else None
+  else:
+    method='encode'
+    video=ENCODE_PROFILES[profile]+['-pix_fmt', 'yuv420p']
+    if (stamps):
+      video=['-vf', drawtextFilter( stamps)]+video
+    tag=None
+  # DAV audio is usually G.711, which MP4 can't hold
+  audio='copy' if (probe['audioCodec'] in COPY_AUDIO_CODECS) else 'aac'
+  return method, video, audio, tag
+
+def convertDav2Mp4Command( davPath, mp4Path, mode='auto', profile=DEFAULT_PROFILE, stamps=None):
+  # returns (command, 'copy' or 'encode'), see convertSettings. A stream copy
+  # is the media backend's remux, an ffmpeg command or its own in process run
+  method, video, audio, tag = convertSettings( davPath, mode, profile, stamps)
+  if (method=='copy'):
+    return _backend.remux( davPath, mp4Path, audio, tag), method
+  return backends.ffmpegCommand( FFMPEG, ['-i', davPath], mp4Path, video, audio), method
+
+def directMergeCommand( mergeList, davFolder, mergedFolder, mode='auto', profile=DEFAULT_PROFILE, burn=False):
+  # returns (command, 'copy' or 'encode') converting the DAVs in mergeList
+  # into a single merged MP4. Uses the first clip's codecs for the whole group,
+  # the clips of one contiguous recording share the camera's settings.
+  # burn: stamp each clip's Datetime from its own filename, like the subtitles
+  mergedMp4Path=path( mergedFolder, mergedFileName( mergeList))
+  stamps=None
+  if (burn):
+    stamps=[(catalog.parseClip( file).startDatetime, probeFile( path( davFolder, file))['duration'])
+            for file in mergeList]
+  if (len(mergeList)==1):
+    return convertDav2Mp4Command( path( davFolder, mergeList[0]), mergedMp4Path, mode, profile, stamps)
+  method, video, audio, tag = convertSettings( path( davFolder, mergeList[0]), mode, profile, stamps)
+  davPaths=[path( davFolder, file) for file in mergeList]
+  mergeListTxtFile=mergeListFile( mergeList, mergedFolder)
+  if (method=='copy'):
+    return _backend.concat( davPaths, mergedMp4Path, mergeListTxtFile, audio, tag), method
+  command=backends.ffmpegCommand( FFMPEG, backends.concatInput( mergeListTxtFile, davPaths),
+                                  mergedMp4Path, video, audio)
+  return command, method
+
+def pipedMergeCommands( mergeList, davFolder, mergedFolder, mode='auto', profile=DEFAULT_PROFILE, burn=False):
+  # returns (mux command, [clip commands], 'copy' or 'encode') for PipedMergeJob
+  # Each clip's output timestamps start where the clips before it ended,
+  # from their DHAV durations, so the muxer sees one continuous stream.
+  # Always ffmpeg processes, whichever media backend, the pipes are theirs.
+  mergedMp4Path=path( mergedFolder, mergedFileName( mergeList))
+  clipCommands=[]
+  offset=0.0
+  for file in mergeList:
+    davPath=path( davFolder, file)
+    clip=catalog.parseClip( file)
+    stamps=[(clip.startDatetime, None)] if burn else None
+    method, video, audio, tag = convertSettings( davPath, mode, profile, stamps)
+    # an HEVC tag is an MP4 thing, set on the mux instead
+    command=backends.ffmpegCommand( FFMPEG, ['-i', davPath], 'pipe:1', video or backends.copyVideo(), audio)
+    clipCommands.append( command[:1]+['-nostdin', '-loglevel', 'error']+command[1:-1]+
+                         ['-output_ts_offset', '%.3f' % offset, '-f', 'mpegts', 'pipe:1'])
+    offset+=probeFile( davPath)['duration']
+  muxCommand=[FFMPEG, '-y', '-f', 'mpegts', '-i', 'pipe:0', '-map', '0', '-c', 'copy']+\
+             (['-tag:v', tag] if tag else [])+[mergedMp4Path]
+  return muxCommand, clipCommands, method
+
+# drawtext needs a font file where ffmpeg has no fontconfig (the Windows builds)
+FONT_FILES=['C:/Windows/Fonts/arial.ttf',
+            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+            '/Library/Fonts/Arial.ttf']
+
+def drawtextFont():
+  for fontFile in FONT_FILES:
+    if os.path.exists( fontFile):
+      return 'fontfile=\''+fontFile.replace(':', '\\:')+'\':'
+  return '' # leave it to fontconfig
+
+def drawtextFilter( stamps):
+  # -vf drawing the camera Datetime in the bottom left corner. Each clip gets
+  # its own drawtext over its span of the output, counting from the clip's
+  # filename start like the subtitles. ffmpeg's pts:gmtime adds the frame
+  # time to an epoch, the camera's local time is passed as if it were UTC.
+  filters=[]
+  offset=0.0
+  for startDatetime, duration in stamps:
+    epoch=(startDatetime-datetime.datetime(1970, 1, 1)).total_seconds()-offset
+    drawtext=('drawtext='+drawtextFont()+"text='%{pts\\:gmtime\\:"+('%.3f' % epoch)+"\\:%Y-%m-%d %T}'"
+              ':x=8:y=h-th-8:fontsize=h/20:fontcolor=white:box=1:boxcolor=black@0.5')
+    if (len(stamps)>1):
+      end=offset+duration
+      drawtext+=":enable='between(t,"+('%.3f' % offset)+','+('%.3f' % end)+")'"
+      offset=end
+    filters.append( drawtext)
+  return ','.join(filters)
+
+def namedDuration( file):
+  # duration encoded in the filename, None if it doesn't use the NVR convention
+  clip=catalog.parseClip( file)
+  return clip.namedDuration if clip else None
+
+MAX_MERGED_SIZE=2000000000 # dont make merged videos larger than 2GB
+
+def planRuns( files):
+  # split filenames into runs of contiguous clips, using only the times in
+  # the filenames (see catalog.py). Runs never cross channels. Each run is a
+  # list of slots, a slot is a list of clips with the same recorded time range:
+  # an anomaly has been observed: two files w the same recorded time range
+  # one with _1 appended, but w different file sizes and actual durations
+  # usually the smaller duration is less then the recorded time range
+  # and the larger duration is greater than the recorded time range
+  # neither file duration matches their file name encoded time range
+  clips=catalog.Catalog( files)
+  for file in clips.unparsed:
+    log('skipping '+file+', no start and end times in the filename to merge by')
+    _summary['skipped'].append( file)
+  runs=[]
+  for channel in clips:
+    for run in channel.runs():
+      debug('DB run '+run[0][0].name+' .. '+run[-1][0].name+' '+str(len(run))+' clips\n')
+      runs.append([[clip.name for clip in slot] for slot in run])
+  runs.sort( key=lambda run: run[0][0]) # filename order, like the folder listing
+  return runs
+
+def resolveDuplicates( files, folder):
+  # drop the DAVs that repeat another DAV's recorded time range (the _1
+  # anomaly, see planRuns) before anything is converted, so only the
+  # winner of each slot is ever transcoded
+  keep=set(files)
+  for channel in catalog.Catalog( files):
+    for run in channel.runs():
+      for slot in run:
+        if (len(slot)>1):
+          winner=pickDuplicate( [clip.name for clip in slot], folder)
+          keep.difference_update( clip.name for clip in slot if clip.name!=winner)
+  return [file for file in files if file in keep]
+
+def sourceLength( file, folder):
+  # (recorded seconds, bytes) of a source file, the duration comes from the
+  # DHAV headers (or ffprobe) without decoding anything
+  filePath=path( folder, file)
+  try:
+    duration=probeFile( filePath)['duration'] or 0.0
+  except (OSError, ValueError):
+    duration=0.0
+  return duration, os.path.getsize( filePath)
+
+def pickDuplicate( slot, folder):
+  # keep the longest recording of same time range sources, the larger file
+  # if their durations can't be told apart, and note the discrepancy
+  lengths={file: sourceLength( file, folder) for file in slot}
+  file=max(slot, key=lambda file: lengths[file])
+  describe=lambda file: ' (%.1fs, %.1f MB)' % (lengths[file][0], lengths[file][1]/1000000.0)
+  for skipped in slot:
+    if (skipped!=file and skipped not in _skipped):
+      log('skipping '+skipped+describe( skipped)+', same time range as '+file+describe( file))
+      _skipped.add( skipped)
+      _summary['skipped'].append( skipped)
+  return file
+
+def pickSlotClip( slot, fileSize):
+  # Keep the larger (longer) of same time range files, but note the
+  # discrepancy in the console
+  file=max(slot, key=fileSize)
+  for skipped in slot:
+    if (skipped!=file and skipped not in _skipped):
+      log('skipping '+skipped+', same time range as larger '+file)
+      _skipped.add( skipped)
+      _summary['skipped'].append( skipped)
+  return file
+
+class RunTracker:
+  # follows one run from planRuns() while its clips are converted and hands
+  # out merge lists under maxSize as soon as all of their clips are done.
+  # outputName maps a run's filenames to the files that get merged, fileSize
+  # takes those output names. A clip that failed to convert breaks the run,
+  # so does an empty slot. A growing run (watch mode) gets more slots with
+  # extend() and keeps its last merge list open in mergeList.
+  def __init__(self, run, fileSize, outputName=None, maxSize=MAX_MERGED_SIZE, growing=False):
+    self.slots=run
+    self.fileSize=fileSize
+    self.outputName=outputName or (lambda file: file)
+    self.maxSize=maxSize
+    self.growing=growing
+    self.results={} # filename -> converted ok
+    self.cursor=0 # first slot not handed out yet
+    self.mergeList=[]
+    self.mergedSize=0
+
+  def finished(self, file, ok=True):
+    self.results[file]=ok
+
+  def extend(self, slots):
+    self.slots.extend( slots)
+
+  def readyMergeLists(self):
+    ready=[]
+    while (self.cursor<len(self.slots) and all(file in self.results for file in self.slots[self.cursor])):
+      slot=[self.outputName( file) for file in self.slots[self.cursor] if self.results[file]]
+      self.cursor+=1
+      if (not slot):
+        if (self.mergeList):
+          ready.append( self.mergeList)
+        self.mergeList=[]
+        continue
+      file=pickSlotClip( slot, self.fileSize)
+      if (self.mergeList and self.mergedSize+self.fileSize(file)<self.maxSize):
+        self.mergeList.append(file)
+        self.mergedSize+=self.fileSize(file)
+      else:
+        if (self.mergeList):
+          debug('DB too large, merge list and start new')
+          ready.append( self.mergeList)
+        self.mergeList=[file]
+        self.mergedSize=self.fileSize(file)
+    if (self.cursor==len(self.slots) and self.mergeList and not self.growing):
+      ready.append( self.mergeList)
+      self.mergeList=[]
+    return ready
+
+def splitRun( run, fileSize, maxSize=MAX_MERGED_SIZE):
+  # pick one clip per slot and cut the run into merge lists under maxSize
+  tracker=RunTracker( run, fileSize, maxSize=maxSize)
+  for slot in run:
+    for file in slot:
+      tracker.finished( file)
+  return tracker.readyMergeLists()
+
+def mergedFileName( mergeList):
+  # merged filename with the first file's startDatetime, the last file's endDatetime
+  # a single clip keeps its own name
+  if (len(mergeList)==1):
+    return re.sub( r'\.\w+$', '.mp4', mergeList[0])
+  firstInfo=getVideoFileInfo( mergeList[0]) # doesnt need folder, all info is in filename
+  lastInfo=getVideoFileInfo( mergeList[-1])
+  return firstInfo.namedPrefix + firstInfo.namedStartTime + '_' + lastInfo.namedEndTime + '.mp4'
+
+def subtitleFileName( mergeList, fmt='srt'):
+  firstInfo=getVideoFileInfo( mergeList[0])
+  lastInfo=getVideoFileInfo( mergeList[-1])
+  return firstInfo.namedPrefix + firstInfo.namedStartTime + '_' + lastInfo.namedEndTime + '.' + fmt
+  
+def mergeListFile( mergeList, folder):
+  # one list per merge so merges can run side by side
+  return path( folder, 'Dav2Mp4-mergelist-'+os.path.splitext(mergedFileName( mergeList))[0]+'.txt')
+
+def mergeCommand( mergeList, mp4Folder, mergedFolder):
+  # returns (command, 'copy') concatenating the converted videos, the media
+  # backend's concat: ffmpeg -f concat -safe 0 -i filelist.txt ... -c:v copy -c:a copy output.mp4
+  # (stream copy no reencoding) (filelist.txt=file file1.mp4\nfile file2.mp4\nfile file3.mp4)
+  command=_backend.concat( [path( mp4Folder, file) for file in mergeList],
+                           path( mergedFolder, mergedFileName( mergeList)), mergeListFile( mergeList, mp4Folder))
+  return command, 'copy'
+
+# merges start ahead of waiting conversions, a finished group shouldn't
+# sit behind the rest of the transcoding
+MERGE_PRIORITY=float('inf')
+
+class MergeJob(FfmpegJob):
+  # merges one merge list of converted videos into mergedFolder and builds
+  # its timestamp subtitles, on a pool worker
+  def __init__(self, mergeList, mp4Folder, mergedFolder, subtitleFormat='srt', sources=None):
+    # sources: see writeSubtitles
+    # calc merged filename with the first file's startDatetime, the last file's endDatetime
+    # note: if its just one file, no merge happens, just copy file
+    name=mergedFileName( mergeList) if len(mergeList)>1 else mergeList[0]
+    FfmpegJob.__init__( self, name, functools.partial( mergeCommand, mergeList, mp4Folder, mergedFolder),
+                        path( mergedFolder, name), sum(namedDuration( file) or 0 for file in mergeList),
+                        MERGE_PRIORITY)
+    self.mergeList=mergeList
+    self.weight=len(mergeList)
+    self.memberPaths=[path( mp4Folder, file) for file in mergeList]
+    self.tempFiles=[mergeListFile( mergeList, mp4Folder)]
+    # create a subtitle file w one second long segments for each merged file
+    #    *beware: some files are recorded wrong with different recorded durations and observed durations
+    #     TODO: handle these by checking ffprobe observed duration and created dual subtitles
+    self.subtitlePath=path( mergedFolder, subtitleFileName( mergeList, subtitleFormat))
+    self.after=functools.partial( writeSubtitles, mergeList, mp4Folder, self.subtitlePath,
+                                  subtitleFormat, sources)
+
+  @property
+  def channel(self):
+    clip=catalog.parseClip( self.mergeList[0])
+    return clip.prefix if clip else self.name
+
+  def run(self, pool):
+    if (len(self.mergeList)>1):
+      FfmpegJob.run( self, pool)
+    else:
+      self.started=time.time()
+      self.method=placeFile( self.memberPaths[0], self.outPath)
+      self.seconds=time.time()-self.started
+      self.returncode=0
+      self.after()
+
+FICLONE=0x40049409 # Linux ioctl, a copy-on-write clone on btrfs/XFS
+
+def placeFile( source, destination):
+  # put source's contents at destination without copying the bytes where the
+  # filesystem allows: a hard link, then a copy-on-write clone, then a copy.
+  # The source stays, the journal checks the converted MP4 is still there.
+  # returns 'link', 'clone' or 'copy', or 'none' if source is destination
+  if (samePath( source, destination) or
+      (os.path.exists( destination) and os.path.samefile( source, destination))):
+    return 'none' # already in place, removing destination would lose source
+  if (os.path.exists( destination)):
+    os.remove( destination)
+  try:
+    os.link( source, destination)
+    return 'link'
+  except OSError:
+    pass # other filesystem, or no hard links (FAT, some shares)
+  if (fcntl):
+    try:
+      with open( source, 'rb') as fin, open( destination, 'wb') as fout:
+        fcntl.ioctl( fout.fileno(), FICLONE, fin.fileno())
+      shutil.copystat( source, destination)
+      return 'clone'
+    except OSError:
+      if (os.path.exists( destination)):
+        os.remove( destination)
+  shutil.copy2( source, destination)
+  return 'copy'
+
+class ChannelMerges:
+  # holds back merge jobs so the groups of one camera/channel are merged one
+  # after another, in time order, while different channels merge side by side
+  # on the pool (up to its workers). add() and done() return the jobs to submit.
+  def __init__(self):
+    self.waiting=collections.defaultdict( collections.deque) # channel -> MergeJobs
+    self.busy=set() # channels with a merge on the pool
+
+  def add(self, job):
+    if (job.channel in self.busy):
+      self.waiting[job.channel].append( job)
+      return []
+    self.busy.add( job.channel)
+    return [job]
+
+  def done(self, job):
+    if (self.waiting[job.channel]):
+      return [self.waiting[job.channel].popleft()]
+    self.busy.discard( job.channel)
+    return []
+
+def writeSubtitles( mergeList, folder, subtitlePath, fmt='srt', sources=None):
+  # create subtitle file, one cue per second showing the camera's Datetime
+  # (see subtitles.py for the srt/vtt/ass formats)
+  # Track two simultaneous times:
+  #   1) The cumulative start and stop times for each subtitle
+  #   2) The display Datetime from the surveillance camera
+  # durations come from the files in folder, the MP4s or the DAVs themselves,
+  # or from sources, the path each clip's duration is read from (see clipSources)
+  clips=[]
+  for n, file in enumerate(mergeList):
+    sourcePath=sources[n] if sources else path( folder, file)
+    videoFileInfo = getVideoFileInfo( os.path.basename( sourcePath), os.path.dirname( sourcePath))
+    clips.append( (videoFileInfo.namedStartTimeObj, videoFileInfo.videoDuration))
+  writeSubtitleFile( subtitlePath, clips, fmt)
+
+def clipSources( mergeList, mp4Folder, davFolder, davNames):
+  # where the subtitles read each converted clip's duration: the DAV it was
+  # converted from, whose DHAV headers (cached) need no ffprobe, or the MP4
+  # itself when its DAV isn't known. davNames: MP4 name -> DAV name
+  return [path( davFolder, davNames[file]) if (file in davNames) else path( mp4Folder, file)
+          for file in mergeList]
+
+def writeSubtitleFile( subtitlePath, clips, fmt):
+  # subtitles.writeSubtitles, timed for the metrics
+  started=time.time()
+  subtitles.writeSubtitles( subtitlePath, clips, fmt)
+  _metrics.record( 'subtitles', subtitlePath, time.time()-started, None, fileBytes( subtitlePath),
+                   sum(duration for start, duration in clips), method=fmt)
+
+VideoFileInfo=collections.namedtuple('VideoFileInfo', ['namedPrefix', 'namedStartTime', 'namedEndTime', 'namedStartTimeObj', 'namedEndTimeObj', 'namedDuration', 'fileSize', 'videoDuration'])
+
+def getVideoFileInfo( file, folder=''):
+  # get info from DAV coded filename (parsed once, see catalog.py)
+  # if optional path is included get 'expensive' info from file itself
+  # filename = <CAM>_<StartyyyymmddhhMMss>_<EndyyyymmddhhMMss>{_1}.mp4
+  # dateTime= <yyyymmddhhMMss>
+  clip=catalog.parseClip( file)
+  if (clip is None):
+    raise AttributeError('no start and end times in filename '+file)
+  if (folder):
+    probe=probeFile( path( folder, file))
+    videoDuration=probe['duration']
+    fileSize=probe['size']
+  else:
+    videoDuration=None
+    fileSize=None
+  return VideoFileInfo( clip.prefix, clip.startTime, clip.endTime, clip.startDatetime, clip.endDatetime, clip.namedDuration, fileSize, videoDuration)
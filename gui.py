@@ -0,0 +1,327 @@
+# Dav2Mp4 GUI
+# GPLv3 license
+#
+# tkinter front end for engine.py, only imported when the GUI is launched
+# so the engine and command line run on machines without a display.
+# The engine runs on a worker thread and reports through a queue that the
+# Tk loop drains every DRAIN_MS, so the window stays live while ffmpeg runs.
+
+import threading, queue
+
+from tkinter import * # no prefixes
+import tkinter.scrolledtext as tkst
+from tkinter import ttk # use ttk.prefix
+from tkinter import filedialog
+from tkinter import messagebox
+
+import engine
+import subtitles
+import backends
+import catalog
+
+DRAIN_MS=100
+
+class UI(Frame):
+  def __init__(self, master=None):
+    Frame.__init__(self, master)
+    self.pack(fill=BOTH,expand=1)
+    self.create_widgets()
+    self.processingState=0
+    self.events=queue.Queue() # from GuiReporter on the engine thread
+  
+  def davBrowser(self):
+    folder = filedialog.askdirectory(title="Choose folder with DAV video files", mustexist=1)
+    if folder:
+      self.davFolder.set(folder)
+      self.listClips( catalog.Catalog.scan( folder, ('.dav','.DAV')))
+  
+  def updateProgress(self, progress):
+    self.progressVar.set(progress)
+    
+  def mp4Browser(self):
+    folder = filedialog.askdirectory(title="Choose folder for MP4/AVI video files", mustexist=0)
+    if folder:
+      self.mp4Folder.set(folder)
+      self.listClips( catalog.Catalog.scan( folder, ('.mp4','.MP4','.avi','.AVI')))
+      
+  def listClips(self, clips):
+    # list a folder's clips channel by channel, and log each channel's time span
+    self.fileList.configure(state='normal')
+    for channel in clips:
+      runs=len(channel.runs())
+      self.log(channel.prefix+': '+str(len(channel))+' clips, '+str(channel.clips[0].startDatetime)+' to '+
+               str(max(clip.endDatetime for clip in channel))+', '+str(runs)+(' run' if runs==1 else ' runs'))
+      for clip in channel:
+        self.fileList.insert( "end", clip.name+"\n")
+    for file in clips.unparsed:
+      self.fileList.insert( "end", file+"\n")
+    self.fileList.configure(state='disabled')
+
+  def mergedBrowser(self):
+    folder = filedialog.askdirectory(title="Choose folder to save merged MP4 video files", mustexist=0)
+    if folder:
+      self.mergedFolder.set(folder)
+      
+  def clearFileList(self):
+    self.fileList.configure(state='normal')
+    self.fileList.delete("1.0",END)
+    self.fileList.configure(state='disabled')
+    
+  def addToFileList(self, text, tag='done'):
+    self.fileList.configure(state='normal')
+    self.fileList.insert("end", text+"\n", tag)
+    self.fileList.configure(state='disabled')
+    
+  def options(self):
+    return engine.Options( convert=bool(self.runDav2Mp4.get()), merge=bool(self.runMergeMp4.get()),
+                           direct=bool(self.directMerge.get() or self.pipeMerge.get()),
+                           pipe=bool(self.pipeMerge.get()), workers=self.workers.get(),
+                           codecMode=self.codecMode.get(), encodeProfile=self.encodeProfile.get(),
+                           resume=bool(self.resume.get()), subtitleFormat=self.subtitleFormat.get(),
+                           burnTimestamps=bool(self.burnTimestamps.get()), backend=self.backend.get())
+
+  def convertHandler(self):
+    options=self.options()
+    error=engine.checkFolders( self.davFolder.get(), self.mp4Folder.get(), self.mergedFolder.get(), options)
+    if (error):
+      messagebox.showerror("Error", error)
+    elif self.processingState==0:
+      self.processingState=1
+      self.convertButton.configure(state='disabled')
+      self.cancelButton.configure(state='normal')
+      engine.resetCancel() # before the thread starts, a quick Cancel still counts
+      worker=threading.Thread( target=self.runEngine, daemon=True,
+        args=(self.davFolder.get(), self.mp4Folder.get(), self.mergedFolder.get(), options))
+      worker.start()
+      self.after( DRAIN_MS, self.drainEvents)
+
+  def runEngine(self, davFolder, mp4Folder, mergedFolder, options):
+    # on the worker thread, never touch widgets here
+    try:
+      engine.runConversions( davFolder, mp4Folder, mergedFolder, options, GuiReporter(self.events))
+    except Exception as error:
+      self.events.put(('log', 'error: '+str(error)))
+    finally:
+      self.events.put(('finished',))
+
+  def drainEvents(self):
+    # apply everything queued since the last drain in one go: one insert
+    # for all the log lines and only the latest progress
+    lines=[]
+    progress=None
+    finished=False
+    while True:
+      try:
+        event=self.events.get_nowait()
+      except queue.Empty:
+        break
+      if (event[0]=='log'):
+        lines.append( event[1])
+        continue
+      if (lines):
+        self.log('\n'.join(lines)) # keep log and file list in order
+        lines=[]
+      if (event[0]=='progress'):
+        progress=event[1]
+      elif (event[0]=='clear'):
+        self.clearFileList()
+      elif (event[0]=='add'):
+        self.addToFileList( event[1])
+      elif (event[0]=='failed'):
+        self.addToFileList( event[1], 'failed')
+      elif (event[0]=='finished'):
+        finished=True
+    if (lines):
+      self.log('\n'.join(lines))
+    if (progress is not None):
+      self.updateProgress( progress)
+    if (not finished):
+      self.after( DRAIN_MS, self.drainEvents)
+    elif (self.processingState==2):
+      self.master.destroy()
+    else:
+      self.processingState=0
+      self.convertButton.configure(state='normal')
+      self.cancelButton.configure(state='disabled')
+
+  def cancelHandler(self):
+    # stops the ffmpeg jobs and removes their partial MP4s
+    if self.processingState==1:
+      self.log('cancelling...')
+      self.cancelButton.configure(state='disabled')
+      engine.cancelConversions()
+
+  def closeHandler(self):
+    # closing the window mid-run cancels the ffmpeg jobs and their partial MP4s
+    if self.processingState==1:
+      self.processingState=2 # drainEvents closes the window once the jobs are stopped
+      engine.cancelConversions()
+    elif self.processingState==0:
+      self.master.destroy()
+
+  def log(self, message):
+    self.consoleLog.configure(state='normal')
+    self.consoleLog.insert('end', message+'\n')
+    self.consoleLog.configure(state='disabled')
+    self.consoleLog.see('end')
+    
+  def create_widgets(self):
+    # [header]
+    # [DavLabel][DavFolder][DavBrowseButton][Mp4Label][Mp4Folder][Mp4BrowseButton]
+    # [DavFileList] [convertButton] [Mp4FileList]
+    # [progressBar]
+    # [consoleLog]
+
+    # main layout:
+    self.header = ttk.Label(self, text="Convert surveillance cam DAV video to standard MP4 video")
+    self.header.pack(padx=3, pady=3)
+    
+    # DAV folder selector:
+    self.DavSelector = ttk.Frame(self)
+    self.DavSelector.pack(fill=X)
+    self.davFolderLabel = ttk.Label(self.DavSelector, text="DAV folder:")
+    self.davFolderLabel.pack(side="left")
+    self.davFolder=StringVar()
+    # TODO: add onChange handler for entry widget
+    self.davFolderEntry = ttk.Entry(self.DavSelector, width=0, textvariable=self.davFolder)
+    self.davFolderEntry.pack(side="left",fill=X,expand=1)
+    self.davBrowseButton = ttk.Button(self.DavSelector, text="Browse", command=self.davBrowser)
+    self.davBrowseButton.pack(side="left", padx=3)
+    
+    # MP4 folder selector:
+    self.mp4Selector = ttk.Frame(self)
+    self.mp4Selector.pack(fill=X)
+    self.mp4FolderLabel = ttk.Label(self.mp4Selector, text="MP4/AVI folder:")
+    self.mp4FolderLabel.pack(side="left")
+    self.mp4Folder=StringVar()
+    # TODO: add onChange handler for entry widget
+    self.mp4FolderEntry = ttk.Entry(self.mp4Selector, width=0, textvariable=self.mp4Folder)
+    self.mp4FolderEntry.pack(side="left",fill=X,expand=1)
+    self.mp4BrowseButton = ttk.Button(self.mp4Selector, text="Browse", command=self.mp4Browser)
+    self.mp4BrowseButton.pack(side="left", padx=3)
+
+    # Merged folder selector:
+    self.mergedSelector = ttk.Frame(self)
+    self.mergedSelector.pack(fill=X)
+    self.mergedFolderLabel = ttk.Label(self.mergedSelector, text="Merged MP4 folder:")
+    self.mergedFolderLabel.pack(side="left")
+    self.mergedFolder=StringVar()
+    # TODO: add onChange handler for entry widget
+    self.mergedFolderEntry = ttk.Entry(self.mergedSelector, width=0, textvariable=self.mergedFolder)
+    self.mergedFolderEntry.pack(side="left",fill=X,expand=1)
+    self.mergedBrowseButton = ttk.Button(self.mergedSelector, text="Browse", command=self.mergedBrowser)
+    self.mergedBrowseButton.pack(side="left", padx=3)
+    
+    # pass checkboxes:
+    self.passSelections = ttk.Frame(self, borderwidth=2, relief=GROOVE)
+    self.passSelections.pack(fill=X, pady=3)
+    self.runDav2Mp4=IntVar()
+    self.runDav2Mp4.set(1)
+    self.checkRunDav2Mp4 = ttk.Checkbutton(self.passSelections, text="convert DAVs to MP4 w ffmpeg", variable=self.runDav2Mp4)
+    self.checkRunDav2Mp4.pack(fill=X)
+    #self.dummy = ttk.Checkbutton(self.passSelections, text="convert DAVs to AVI w BahamaSecurity", state=DISABLED)
+    #self.dummy.pack(fill=X)
+    #self.dummy = ttk.Checkbutton(self.passSelections, text="convert DAVs to AVI w DahuaSDK", state=DISABLED)
+    #self.dummy.pack(fill=X)
+    self.runMergeMp4=IntVar()
+    self.runMergeMp4.set(1)
+    self.checkRunMergeMp4 = ttk.Checkbutton(self.passSelections, text="Merge contiguous MP4s/AVIs and make timestamp subtitles", variable=self.runMergeMp4)
+    self.checkRunMergeMp4.pack(fill=X)
+    self.directMerge=IntVar()
+    self.directMerge.set(0)
+    self.checkDirectMerge = ttk.Checkbutton(self.passSelections, text="Single pass: convert contiguous DAVs straight into merged MP4s (no MP4 folder needed)", variable=self.directMerge)
+    self.checkDirectMerge.pack(fill=X)
+    self.pipeMerge=IntVar()
+    self.pipeMerge.set(0)
+    self.checkPipeMerge = ttk.Checkbutton(self.passSelections, text="Single pass through pipes: each DAV converted on its own and streamed into the merge", variable=self.pipeMerge)
+    self.checkPipeMerge.pack(fill=X)
+    self.resume=IntVar()
+    self.resume.set(1)
+    self.checkResume = ttk.Checkbutton(self.passSelections, text="Resume: skip clips and merges finished by an earlier run", variable=self.resume)
+    self.checkResume.pack(fill=X)
+    self.burnTimestamps=IntVar()
+    self.burnTimestamps.set(0)
+    self.checkBurnTimestamps = ttk.Checkbutton(self.passSelections, text="Burn DateTime into the video while converting (re-encodes)", variable=self.burnTimestamps)
+    self.checkBurnTimestamps.pack(fill=X)
+    self.workersFrame = ttk.Frame(self.passSelections)
+    self.workersFrame.pack(fill=X)
+    self.workers=IntVar()
+    self.workers.set(engine.DEFAULT_WORKERS)
+    self.workersSpinbox = Spinbox(self.workersFrame, from_=1, to=64, width=3, textvariable=self.workers)
+    self.workersSpinbox.pack(side="left")
+    self.workersLabel = ttk.Label(self.workersFrame, text="ffmpeg conversions at once")
+    self.workersLabel.pack(side="left", padx=3)
+    self.subtitleFormat=StringVar()
+    self.subtitleFormat.set('srt')
+    self.subtitleFormatLabel = ttk.Label(self.workersFrame, text="subtitles:")
+    self.subtitleFormatLabel.pack(side="left", padx=3)
+    self.subtitleFormatCombo = ttk.Combobox(self.workersFrame, width=5, state='readonly', values=subtitles.FORMATS, textvariable=self.subtitleFormat)
+    self.subtitleFormatCombo.pack(side="left", padx=3)
+    self.backend=StringVar()
+    self.backend.set('ffmpeg')
+    self.backendLabel = ttk.Label(self.workersFrame, text="probe/copy with:")
+    self.backendLabel.pack(side="left", padx=3)
+    self.backendCombo = ttk.Combobox(self.workersFrame, width=6, state='readonly', values=backends.available(), textvariable=self.backend)
+    self.backendCombo.pack(side="left", padx=3)
+    self.codecFrame = ttk.Frame(self.passSelections)
+    self.codecFrame.pack(fill=X)
+    self.codecMode=StringVar()
+    self.codecMode.set('auto')
+    self.codecModeLabel = ttk.Label(self.codecFrame, text="video:")
+    self.codecModeLabel.pack(side="left")
+    self.codecModeCombo = ttk.Combobox(self.codecFrame, width=7, state='readonly', values=engine.CODEC_MODES, textvariable=self.codecMode)
+    self.codecModeCombo.pack(side="left", padx=3)
+    self.encodeProfile=StringVar()
+    self.encodeProfile.set(engine.DEFAULT_PROFILE)
+    self.encodeProfileLabel = ttk.Label(self.codecFrame, text="re-encode profile:")
+    self.encodeProfileLabel.pack(side="left")
+    self.encodeProfileCombo = ttk.Combobox(self.codecFrame, width=9, state='readonly', values=list(engine.ENCODE_PROFILES), textvariable=self.encodeProfile)
+    self.encodeProfileCombo.pack(side="left", padx=3)
+    self.codecHelpLabel = ttk.Label(self.codecFrame, text="(auto: stream copy H.264/H.265, re-encode the rest)")
+    self.codecHelpLabel.pack(side="left")
+    
+    # GO button and Progress bar
+    self.progressFrame = ttk.Frame(self)
+    self.progressFrame.pack(fill=X)
+    self.convertButton = ttk.Button(self.progressFrame, text="Convert=>", command=self.convertHandler)
+    self.convertButton.pack(side="left", padx=3)
+    self.cancelButton = ttk.Button(self.progressFrame, text="Cancel", command=self.cancelHandler, state='disabled')
+    self.cancelButton.pack(side="left", padx=3)
+    self.progressVar=DoubleVar()
+    self.progressBar = ttk.Progressbar(self.progressFrame,
+      mode="determinate", orient="horizontal",
+      maximum=100.0, value=0.0, variable=self.progressVar)
+    self.progressBar.pack(fill=X, padx=3, pady=5)
+    
+    # Files list and console/log text:
+    self.fileList = tkst.ScrolledText(self, width=10, height=3, state='disabled')
+    self.fileList.pack(fill=BOTH,expand=1)
+    self.fileList.tag_configure('done', background='pale green')
+    self.fileList.tag_configure('failed', background='tomato')
+    self.consoleLog = tkst.ScrolledText(self, width=10, height=3, state='disabled')
+    self.consoleLog.pack(fill=BOTH,expand=1)
+
+class GuiReporter(engine.Reporter):
+  # queues engine progress for UI.drainEvents, called on the engine thread
+  def __init__(self, events):
+    self.events=events
+  def log(self, text):
+    self.events.put(('log', text))
+  def progress(self, percent):
+    self.events.put(('progress', percent))
+  def clearFileList(self):
+    self.events.put(('clear',))
+  def addToFileList(self, file):
+    self.events.put(('add', file))
+  def fileFailed(self, file):
+    self.events.put(('failed', file))
+
+################################
+
+def runGui():
+  root = Tk()
+  ui = UI(master=root)
+  ui.master.title("Dav2Mp4")
+  ui.master.geometry("800x600")
+  ui.master.protocol("WM_DELETE_WINDOW", ui.closeHandler)
+  ui.mainloop()
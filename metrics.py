@@ -0,0 +1,171 @@
+# Dav2Mp4 metrics
+# GPLv3 license
+#
+# Records how long each file spends in each stage (probe, convert, concat,
+# copy, subtitles, direct, pipe, extract) with its bytes in and out, seconds
+# of video, throughput (seconds of video per wall second) and the ffmpeg exit
+# code. Every record is a JSON line appended to Dav2Mp4-metrics.jsonl next
+# to the log files, so runs can be charted over time, and is added up per
+# stage, per channel and per codec for the end of run summary.
+#
+# All files go through a LogWriter: lines are queued with the time they were
+# logged and a background thread writes whatever has queued up in one go,
+# so neither the engine nor the pool workers wait on the disk per line.
+#
+# A metrics line (fields that don't apply are left out):
+#   {"time": "2017-06-01 22:00:03.250", "run": "2017-06-01 22:00:00",
+#    "stage": "convert", "file": "NPV-CH01-MAIN-...dav", "channel": "NPV-CH01-MAIN-",
+#    "seconds": 1.234, "inBytes": 8000000, "outBytes": 7900000, "videoSeconds": 60.0,
+#    "throughput": 48.6, "exitCode": 0, "method": "copy", "codec": "h264", "ok": true}
+# and each run ends with a {"time", "run", "summary"} line, see Metrics.summary()
+
+import os
+import time
+import json
+import queue
+import threading
+import collections
+
+import catalog
+
+METRICSFILE='Dav2Mp4-metrics.jsonl'
+# stages that put a channel's video through ffmpeg, their records also add
+# up per channel and per codec to find the slow cameras
+VIDEO_STAGES=('convert', 'direct', 'pipe', 'extract')
+
+def timeText( when):
+  # 'YYYY-MM-DD HH:MM:SS.mmm' local time
+  return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime( when))+'.%03d' % (when%1*1000)
+
+class LogWriter:
+  # appends lines to a file from a background thread, write() only queues
+  def __init__(self, filePath, mode='wb', timestamps=True):
+    self.file=open( filePath, mode)
+    self.timestamps=timestamps # start each line with the time it was written
+    self.lines=queue.Queue()
+    self.thread=threading.Thread( target=self._writer, daemon=True)
+    self.thread.start()
+
+  def write(self, line):
+    # line: bytes without the newline, safe from any thread
+    self.lines.put((time.time(), line))
+
+  def close(self):
+    # writes out everything queued so far
+    self.lines.put( None)
+    self.thread.join()
+    self.file.close()
+
+  def _writer(self):
+    while True:
+      batch=[self.lines.get()]
+      while True:
+        try:
+          batch.append( self.lines.get_nowait())
+        except queue.Empty:
+          break
+      closing=None in batch
+      self.file.write(b''.join((timeText( when).encode()+b' ' if self.timestamps else b'')+line+b'\n'
+                               for when, line in filter(None, batch)))
+      self.file.flush()
+      if (closing):
+        return
+
+class Totals:
+  # one stage's (or channel's, or codec's) records added up
+  __slots__=('files', 'failed', 'seconds', 'inBytes', 'outBytes', 'videoSeconds')
+
+  def __init__(self):
+    self.files=0
+    self.failed=0
+    self.seconds=0.0
+    self.inBytes=0
+    self.outBytes=0
+    self.videoSeconds=0.0
+
+  def add(self, seconds, inBytes, outBytes, videoSeconds, ok):
+    self.files+=1
+    self.failed+=0 if ok else 1
+    self.seconds+=seconds
+    self.inBytes+=inBytes or 0
+    self.outBytes+=outBytes or 0
+    self.videoSeconds+=videoSeconds or 0.0
+
+  def asDict(self):
+    return collections.OrderedDict([
+      ('files', self.files), ('failed', self.failed), ('seconds', round(self.seconds, 3)),
+      ('inBytes', self.inBytes), ('outBytes', self.outBytes),
+      ('videoSeconds', round(self.videoSeconds, 3)),
+      ('throughput', round(self.videoSeconds/self.seconds, 2) if self.seconds else None)])
+
+class Metrics:
+  # one run's records, open() starts a run and close() ends it
+  def __init__(self):
+    self.writer=None
+    self.run=None
+    self._lock=threading.Lock()
+    self._reset()
+
+  def _reset(self):
+    self.stages=collections.OrderedDict()
+    self.channels=collections.OrderedDict()
+    self.codecs=collections.OrderedDict()
+
+  def open(self, folder):
+    self.close()
+    self._reset()
+    self.run=timeText( time.time())[:19]
+    self.writer=LogWriter( os.path.join( folder, METRICSFILE), 'ab', timestamps=False)
+
+  def record(self, stage, file, seconds, inBytes=None, outBytes=None, videoSeconds=None,
+             exitCode=None, method=None, codec=None, ok=None):
+    # one file through one stage, safe from any thread
+    # ok defaults to a zero (or no) exitCode
+    clip=catalog.parseClip( os.path.basename( file))
+    channel=clip.prefix if clip else None
+    entry=collections.OrderedDict([
+      ('time', timeText( time.time())), ('run', self.run), ('stage', stage),
+      ('file', os.path.basename( file)), ('channel', channel), ('seconds', round(seconds, 3)),
+      ('inBytes', inBytes), ('outBytes', outBytes), ('videoSeconds', videoSeconds),
+      ('throughput', round(videoSeconds/seconds, 2) if (videoSeconds and seconds) else None),
+      ('exitCode', exitCode), ('method', method), ('codec', codec)])
+    if (ok is None):
+      ok=not exitCode
+    entry['ok']=ok
+    with self._lock:
+      groups=[(self.stages, stage)]
+      if (stage in VIDEO_STAGES):
+        groups+=[(self.channels, channel), (self.codecs, codec)]
+      for totals, key in groups:
+        if (key is not None):
+          totals.setdefault( key, Totals()).add( seconds, inBytes, outBytes, videoSeconds, ok)
+    if (self.writer):
+      self.writer.write( json.dumps({name: value for name, value in entry.items() if value is not None}).encode())
+
+  def summary(self):
+    # {'stages': {...}, 'channels': {...}, 'codecs': {...}} of Totals dicts
+    with self._lock:
+      return collections.OrderedDict(
+        (name, collections.OrderedDict( (key, totals.asDict()) for key, totals in group.items()))
+        for name, group in (('stages', self.stages), ('channels', self.channels), ('codecs', self.codecs)))
+
+  def summaryLines(self):
+    # the summary as text for the log, slowest channels first
+    summary=self.summary()
+    lines=[]
+    channels=sorted(summary['channels'].items(), key=lambda item: item[1]['throughput'] or 0.0)
+    for heading, group in (('stage', summary['stages'].items()), ('channel', channels),
+                           ('codec', summary['codecs'].items())):
+      for name, totals in group:
+        lines.append('%-8s %-22s %5d files %3d failed %9.2fs %10.1f MB in %10.1f MB out %s' % (
+          heading, name, totals['files'], totals['failed'], totals['seconds'],
+          totals['inBytes']/1000000.0, totals['outBytes']/1000000.0,
+          '%8.1f video s/s' % totals['throughput'] if totals['throughput'] else ''))
+    return lines
+
+  def close(self):
+    if (self.writer):
+      self.writer.write( json.dumps( collections.OrderedDict([('time', timeText( time.time())),
+                         ('run', self.run), ('summary', self.summary())])).encode())
+      self.writer.close()
+      self.writer=None
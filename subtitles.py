@@ -0,0 +1,122 @@
+# Dav2Mp4 subtitles
+# GPLv3 license
+#
+# Builds the DateTime subtitle file for a merged video: one cue per second
+# showing the camera's date and time, restarting from each clip's filename
+# time so the display 'catches up' at every clip boundary.
+#
+# A 24 hour merge is 86,400 cues, so cues are not built one at a time with
+# datetime/strftime. All times are integer milliseconds, the text for a
+# whole clip is made with list comprehensions over prebuilt 'MM:SS' and
+# 'HH:MM:SS' tables and written out one clip at a time.
+# bench/bench_subtitles.py compares this with the old per-cue loop.
+#
+# Formats:
+#   srt: <seqid> / hh:mm:ss,ms --> hh:mm:ss,ms / text / blank
+#   vtt: WEBVTT header, then hh:mm:ss.ms --> hh:mm:ss.ms / text / blank
+#   ass: [Script Info]/[V4+ Styles] header, then
+#        Dialogue: 0,h:mm:ss.cc,h:mm:ss.cc,Default,,0,0,0,,text
+
+FORMATS=('srt', 'vtt', 'ass')
+
+_ASS_HEADER='''[Script Info]
+ScriptType: v4.00+
+PlayResX: 384
+PlayResY: 288
+WrapStyle: 2
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,16,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,1,0,2,10,10,10,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+'''
+
+_MMSS=['%02d:%02d' % divmod(second, 60) for second in range(3600)]
+_HHMMSS=None # 'HH:MM:SS' for every second of a day, built on first use
+
+def _clockTable():
+  global _HHMMSS
+  if _HHMMSS is None:
+    _HHMMSS=['%02d:%s' % (hour, mmss) for hour in range(24) for mmss in _MMSS]
+  return _HHMMSS
+
+def _stamps( firstSecond, count, fraction, fmt):
+  # timestamps for count consecutive whole seconds from firstSecond,
+  # all with the same fractional part (milliseconds)
+  if (fmt=='ass'):
+    tail='.%02d' % (fraction//10)
+  else:
+    tail=(',%03d' if fmt=='srt' else '.%03d') % fraction
+  stamps=[]
+  second=firstSecond
+  end=firstSecond+count
+  while second<end:
+    hour=second//3600
+    stop=min(end, (hour+1)*3600)
+    prefix=('%d:' if fmt=='ass' else '%02d:') % hour
+    stamps+=[prefix+mmss+tail for mmss in _MMSS[second-hour*3600:stop-hour*3600]]
+    second=stop
+  return stamps
+
+def _stamp( ms, fmt):
+  return _stamps( ms//1000, 1, ms%1000, fmt)[0]
+
+def _displayTimes( startDatetime, count):
+  # 'YYYY-MM-DD HH:MM:SS' for count seconds from startDatetime
+  clock=_clockTable()
+  texts=[]
+  day=startDatetime.date()
+  second=startDatetime.hour*3600+startDatetime.minute*60+startDatetime.second
+  while count>0:
+    stop=min(86400, second+count)
+    date=day.isoformat()+' '
+    texts+=[date+hhmmss for hhmmss in clock[second:stop]]
+    count-=stop-second
+    second=0
+    day=day.fromordinal( day.toordinal()+1)
+  return texts
+
+def clipCues( startMs, durationMs, startDatetime, fmt):
+  # (starts, ends, texts) for one clip: a cue per second starting at
+  # startMs in the merged video, ending 1ms before the next one, except the
+  # last which ends at the exact finish of the clip
+  fullCues=max(0, (durationMs-999)//1000+1) # cues that fit a whole 999ms
+  starts=_stamps( startMs//1000, fullCues, startMs%1000, fmt)
+  endMs=startMs+999
+  ends=_stamps( endMs//1000, fullCues, endMs%1000, fmt)
+  count=fullCues
+  if (fullCues*1000<durationMs):
+    starts.append( _stamp( startMs+fullCues*1000, fmt))
+    ends.append( _stamp( startMs+durationMs, fmt))
+    count+=1
+  return starts, ends, _displayTimes( startDatetime, count)
+
+def writeSubtitles( subtitlePath, clips, fmt='srt'):
+  # clips: (start datetime from the filename, duration in seconds) for each
+  # clip of the merged video, in order
+  if (fmt not in FORMATS):
+    raise ValueError('unknown subtitle format '+str(fmt))
+  cueId=1
+  startMs=0
+  with open( subtitlePath, 'w', encoding='utf-8', buffering=1<<20) as f:
+    if (fmt=='vtt'):
+      f.write('WEBVTT\n\n')
+    elif (fmt=='ass'):
+      f.write(_ASS_HEADER)
+    for startDatetime, duration in clips:
+      durationMs=int(round(duration*1000))
+      starts, ends, texts = clipCues( startMs, durationMs, startDatetime, fmt)
+      if (fmt=='srt'):
+        ids=map(str, range(cueId, cueId+len(starts)))
+        f.write(''.join([id+'\n'+start+' --> '+end+'\n'+text+'\n\n'
+                         for id, start, end, text in zip(ids, starts, ends, texts)]))
+      elif (fmt=='vtt'):
+        f.write(''.join([start+' --> '+end+'\n'+text+'\n\n'
+                         for start, end, text in zip(starts, ends, texts)]))
+      else:
+        f.write(''.join(['Dialogue: 0,'+start+','+end+',Default,,0,0,0,,'+text+'\n'
+                         for start, end, text in zip(starts, ends, texts)]))
+      cueId+=len(starts)
+      startMs+=durationMs+1 # Next file start time
@@ -0,0 +1,145 @@
+# Dav2Mp4 media backend tests
+# GPLv3 license
+#
+# Every backend that can run here probes, remuxes and concatenates the same
+# small clips, made with PyAV or the ffmpeg executable: 3 second h264 videos
+# with PCM audio in Matroska standing in for DAVs, whose audio MP4 can't hold.
+#   python -m pytest tests
+# The ffmpeg backend needs ffmpeg and ffprobe on the PATH, the pyav backend
+# PyAV (pip install av). Tests of a backend that can't run are skipped.
+
+import os, sys
+import fractions
+import shutil
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import backends
+
+CLIP_SECONDS=3.0
+RATE=10 # video frames per second
+SAMPLE_RATE=8000
+
+def runnable( name):
+  if (name not in backends.available()):
+    return False
+  if (name=='ffmpeg'):
+    return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+  return True
+
+def makeClipAv( clipPath, seconds, n):
+  av=backends.loadAv()
+  with av.open( clipPath, 'w', format='matroska') as output:
+    video=output.add_stream( 'libx264', rate=RATE)
+    video.width=160
+    video.height=120
+    video.pix_fmt='yuv420p'
+    video.options={'bf':'0'} # Matroska has no dts to hold B-frame reordering
+    audio=output.add_stream( 'pcm_s16le', rate=SAMPLE_RATE)
+    audio.codec_context.layout='mono'
+    for frameNumber in range(int(seconds*RATE)):
+      frame=av.VideoFrame( 160, 120, 'yuv420p')
+      for plane in frame.planes:
+        plane.update( bytes([(n*50+frameNumber*7)%256])*plane.buffer_size)
+      frame.pts=frameNumber
+      for packet in video.encode( frame):
+        output.mux( packet)
+    for start in range(0, int(seconds*SAMPLE_RATE), 800):
+      frame=av.AudioFrame( format='s16', layout='mono', samples=800)
+      frame.planes[0].update( bytes(frame.planes[0].buffer_size))
+      frame.sample_rate=SAMPLE_RATE
+      frame.pts=start
+      frame.time_base=fractions.Fraction(1, SAMPLE_RATE)
+      for packet in audio.encode( frame):
+        output.mux( packet)
+    for stream in (video, audio):
+      for packet in stream.encode( None):
+        output.mux( packet)
+
+def makeClipFfmpeg( clipPath, seconds, n):
+  subprocess.check_call(['ffmpeg', '-v', 'error', '-y',
+                         '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=%d:duration=%s' % (RATE, seconds),
+                         '-f', 'lavfi', '-i', 'sine=frequency=%d:sample_rate=%d:duration=%s' % (200+n*100, SAMPLE_RATE, seconds),
+                         '-c:v', 'libx264', '-bf', '0', '-pix_fmt', 'yuv420p', '-c:a', 'pcm_s16le',
+                         '-f', 'matroska', clipPath])
+
+@pytest.fixture(scope='module')
+def davs( tmp_path_factory):
+  # three contiguous clips of one channel, NVR named
+  if ('pyav' in backends.available()):
+    makeClip=makeClipAv
+  elif (shutil.which('ffmpeg')):
+    makeClip=makeClipFfmpeg
+  else:
+    pytest.skip('making test clips needs PyAV or ffmpeg')
+  folder=tmp_path_factory.mktemp('dav')
+  clips=[]
+  for n in range(3):
+    name='NPV-CH01-MAIN-2017010100%02d%02d-2017010100%02d%02d.dav' % (0, n*3, 0, n*3+2)
+    makeClip( str(folder/name), CLIP_SECONDS, n)
+    clips.append( str(folder/name))
+  return clips
+
+@pytest.fixture(params=list(backends.BACKENDS))
+def backend( request):
+  if (not runnable( request.param)):
+    pytest.skip('the '+request.param+' backend can\'t run here')
+  return backends.create( request.param, 'ffmpeg', 'ffprobe')
+
+def execute( command):
+  # what remux() and concat() return, run the way FfmpegJob does
+  if (isinstance(command, backends.InProcess)):
+    return command.run( lambda seconds: None, backends.Cancel())
+  return subprocess.call( command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def checkMp4( backend, mp4Path, duration):
+  # a readable MP4 of the expected length, h264 video and AAC audio
+  assert os.path.getsize( mp4Path)>0
+  with open( mp4Path, 'rb') as f:
+    assert f.read(8)[4:]==b'ftyp'
+  probe=backend.probe( mp4Path)
+  assert probe['videoCodec']=='h264'
+  assert probe['audioCodec']=='aac'
+  assert abs(probe['duration']-duration)<0.5
+
+def test_probe( backend, davs):
+  probe=backend.probe( davs[0])
+  assert probe['videoCodec']=='h264'
+  assert probe['audioCodec']=='pcm_s16le'
+  assert abs(probe['duration']-CLIP_SECONDS)<0.2
+
+def test_remux( backend, davs, tmp_path):
+  mp4Path=str(tmp_path/'clip.mp4')
+  assert execute( backend.remux( davs[0], mp4Path, 'aac'))==0
+  checkMp4( backend, mp4Path, CLIP_SECONDS)
+
+def test_concat_mp4s( backend, davs, tmp_path):
+  mp4Paths=[]
+  for n, davPath in enumerate(davs):
+    mp4Paths.append( str(tmp_path/('clip%d.mp4' % n)))
+    assert execute( backend.remux( davPath, mp4Paths[-1], 'aac'))==0
+  mergedPath=str(tmp_path/'merged.mp4')
+  assert execute( backend.concat( mp4Paths, mergedPath, str(tmp_path/'list.txt')))==0
+  checkMp4( backend, mergedPath, CLIP_SECONDS*len(davs))
+
+def test_concat_davs( backend, davs, tmp_path):
+  mergedPath=str(tmp_path/'merged.mp4')
+  assert execute( backend.concat( davs, mergedPath, str(tmp_path/'list.txt'), 'aac'))==0
+  checkMp4( backend, mergedPath, CLIP_SECONDS*len(davs))
+
+def test_cancel( backend, davs, tmp_path):
+  command=backend.concat( davs, str(tmp_path/'merged.mp4'), str(tmp_path/'list.txt'), 'aac')
+  if (not isinstance(command, backends.InProcess)):
+    pytest.skip('an ffmpeg process is cancelled by killing it')
+  cancel=backends.Cancel()
+  cancel.kill()
+  assert command.run( lambda seconds: None, cancel)==backends.CANCELLED
+
+def test_no_av_import():
+  # the CLI starts without PyAV's import time unless --backend pyav is used
+  code='import sys; import engine; print("av" in sys.modules)'
+  out=subprocess.check_output([sys.executable, '-c', code],
+                              cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+  assert out.strip()==b'False'
@@ -0,0 +1,33 @@
+# Dav2Mp4 folder watch
+# GPLv3 license
+#
+# Finds DAV files an NVR has finished exporting into a folder it keeps
+# writing to. A file is handed out once its size and modification time
+# have not changed between two polls, so a half copied export is never
+# converted. Each poll is one scandir of the folder, the files already
+# handed out are only remembered by name.
+
+import os
+
+DAV_EXTENSIONS=('.dav', '.DAV')
+
+class FolderWatch:
+  def __init__(self, folder, extensions=DAV_EXTENSIONS):
+    self.folder=folder
+    self.extensions=extensions
+    self.growing={} # name -> (size, mtime) at the last poll
+    self.taken=set() # names already handed out
+
+  def poll(self):
+    # returns the sorted names that stopped changing since the last poll
+    current={}
+    with os.scandir( self.folder) as entries:
+      for entry in entries:
+        if (entry.name.endswith( self.extensions) and entry.name not in self.taken and entry.is_file()):
+          stat=entry.stat()
+          current[entry.name]=(stat.st_size, stat.st_mtime_ns)
+    stable=sorted(name for name, stamp in current.items()
+                  if stamp[0]>0 and self.growing.get( name)==stamp)
+    self.taken.update( stable)
+    self.growing={name:stamp for name, stamp in current.items() if name not in self.taken}
+    return stable